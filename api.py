@@ -1,12 +1,20 @@
-import uvicorn
+import time
+_import_started_at = time.perf_counter()
+
 import sys
 import os
 import json
 import re
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from fastapi import BackgroundTasks, FastAPI, HTTPException, UploadFile, File, Form, Request, Depends, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, EmailStr
-from typing import Dict
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import BaseModel, EmailStr, ValidationError
+from typing import Dict, List, Literal, Optional
+from uuid import UUID
 from dotenv import load_dotenv
 
 # Add the project root to the Python path to resolve src imports
@@ -18,17 +26,80 @@ if os.path.exists(dotenv_path):
     load_dotenv(dotenv_path=dotenv_path)
 
 from src.auth.auth_service import AuthService
+from src.auth.report_store import ReportContextStore
+from src.auth.message_writer import MessageWriteBehind
 from src.agents.analysis_agent import AnalysisAgent
-from src.utils.pdf_extractor import extract_text_from_pdf
+from src.agents.batch_pipeline import BatchPipeline
+from src.utils.rate_limiter import TokenBucketLimiter
+from src.utils.pdf_upload import UploadRejected, UploadSizeLimitMiddleware, spool_pdf
+from src.utils.pagination import decode_cursor
+from src.utils import metrics
+from src.utils.pdf_extractor import (
+    extract_report_async,
+    get_text_cache_stats,
+    shutdown_extraction_pool,
+    warm_extraction_pool,
+)
 from src.config.prompts import SPECIALIST_PROMPTS
+from src.config.app_config import (
+    ANALYSIS_DAILY_LIMIT,
+    BATCH_MAX_ITEMS,
+    BATCH_EXTRACT_CONCURRENCY,
+    BATCH_ANALYZE_CONCURRENCY,
+    BATCH_PERSIST_CONCURRENCY,
+    GROQ_REQUESTS_PER_MINUTE,
+    MAX_BULK_DELETE_SESSIONS,
+    MAX_PAGE_SIZE,
+    MAX_UPLOAD_BYTES,
+    MESSAGE_PAGE_SIZE,
+    RATE_LIMIT_DB_PATH,
+    RATE_LIMITS,
+    REPORT_CONTEXT_CACHE_MAX_ENTRIES,
+    REPORT_CONTEXT_CACHE_MAX_BYTES,
+    SESSION_PAGE_SIZE,
+    UPLOAD_FORM_OVERHEAD_BYTES,
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_FLUSH_INTERVAL,
+    WRITE_BEHIND_MAX_RETRIES,
+    WARMUP_ON_STARTUP,
+)
+
+logger = logging.getLogger(__name__)
 
 # --- FastAPI App Initialization ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARMUP_ON_STARTUP:
+        await _warm_up()
+    yield
+    # Only what was actually built needs stopping
+    message_writer = _services.get("message_writer")
+    if message_writer is not None:
+        await message_writer.stop()
+    analysis_agent = _services.get("analysis_agent")
+    if analysis_agent is not None:
+        await analysis_agent.model_manager.aclose()
+    shutdown_extraction_pool()
+
 app = FastAPI(
     title="Sage API",
     description="API for analyzing medical reports and managing user sessions.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Refuse oversized uploads while the body is still arriving, before multipart parsing spools it.
+# Added before CORS (the last middleware added runs outermost) so its 413s keep the CORS headers.
+_UPLOAD_REQUEST_LIMIT = MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD_BYTES
+app.add_middleware(UploadSizeLimitMiddleware, limits={
+    "/analyze/initial": _UPLOAD_REQUEST_LIMIT,
+    "/analyze/initial/stream": _UPLOAD_REQUEST_LIMIT,
+    "/analyze/batch": BATCH_MAX_ITEMS * _UPLOAD_REQUEST_LIMIT,
+})
+
+# Listing endpoints return a bare JSON array; the cursor for the next page travels in this header
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
 # --- THIS IS THE FIX: Allow all origins to resolve the CORS issue ---
 # This is a robust way to fix the "Failed to fetch" error for now.
 app.add_middleware(
@@ -37,12 +108,140 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 # --- END OF FIX ---
 
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    started_at = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - started_at,
+        method=request.method,
+        route=route.path if route else "unmatched",
+        status=response.status_code,
+    )
+    return response
+
 # --- Service Instances ---
-auth_service = AuthService()
-analysis_agent = AnalysisAgent()
+# Built on first use instead of at import, so a worker starts without creating the
+# Supabase and model clients and /login doesn't wait for the analysis stack.
+# Endpoints receive them through Depends; module helpers call the getters directly.
+_services = {}
+_services_lock = threading.RLock()  # re-entrant: factories call the getters of their dependencies
+
+def _service(name, factory):
+    service = _services.get(name)
+    if service is None:
+        with _services_lock:
+            service = _services.get(name)
+            if service is None:
+                started_at = time.perf_counter()
+                service = factory()
+                metrics.SERVICE_INIT_SECONDS.set(time.perf_counter() - started_at, service=name)
+                _services[name] = service
+    return service
+
+def get_auth_service():
+    return _service("auth_service", AuthService)
+
+def _build_message_writer():
+    auth_service = get_auth_service()
+    message_writer = MessageWriteBehind(
+        auth_service,
+        batch_size=WRITE_BEHIND_BATCH_SIZE,
+        flush_interval=WRITE_BEHIND_FLUSH_INTERVAL,
+        max_retries=WRITE_BEHIND_MAX_RETRIES,
+    )
+    auth_service.write_behind = message_writer
+    return message_writer
+
+def get_message_writer():
+    return _service("message_writer", _build_message_writer)
+
+def get_analysis_agent():
+    return _service("analysis_agent", AnalysisAgent)
+
+def _build_risk_engine():
+    from src.agents.risk_engine import RiskEngine  # pulls in numpy
+    return RiskEngine()
+
+def get_risk_engine():
+    return _service("risk_engine", _build_risk_engine)
+
+def get_report_store():
+    return _service("report_store", lambda: ReportContextStore(
+        get_auth_service(),
+        max_entries=REPORT_CONTEXT_CACHE_MAX_ENTRIES,
+        max_bytes=REPORT_CONTEXT_CACHE_MAX_BYTES,
+    ))
+
+def get_batch_pipeline():
+    return _service("batch_pipeline", lambda: BatchPipeline(
+        get_analysis_agent(),
+        get_message_writer(),
+        get_report_store(),
+        extract_concurrency=BATCH_EXTRACT_CONCURRENCY,
+        analyze_concurrency=BATCH_ANALYZE_CONCURRENCY,
+        persist_concurrency=BATCH_PERSIST_CONCURRENCY,
+        requests_per_minute=GROQ_REQUESTS_PER_MINUTE,
+    ))
+
+def get_rate_limiter():
+    return _service("rate_limiter", lambda: TokenBucketLimiter(RATE_LIMIT_DB_PATH, RATE_LIMITS))
+
+def _build_token_verifier():
+    from src.auth.token_verifier import TokenVerifier  # pulls in PyJWT and cryptography
+    return TokenVerifier(get_auth_service())
+
+def get_token_verifier():
+    return _service("token_verifier", _build_token_verifier)
+
+async def _warm_up():
+    """
+    Build every service and open its connections before the first request: a trivial
+    Supabase query, one request per model provider, and pdfplumber loaded in each
+    extraction worker. Failures are logged; the service is retried on first use.
+    """
+    started_at = time.perf_counter()
+    for getter in (get_batch_pipeline, get_risk_engine, get_rate_limiter, get_token_verifier):
+        try:
+            await asyncio.to_thread(getter)
+        except Exception as e:
+            logger.error(f"Warm-up: {getter.__name__} failed: {e}")
+
+    connections = [warm_extraction_pool()]
+    if "auth_service" in _services:
+        connections.append(asyncio.to_thread(_services["auth_service"].warm_up))
+    if "analysis_agent" in _services:
+        connections.append(_services["analysis_agent"].model_manager.warm())
+    for outcome in await asyncio.gather(*connections, return_exceptions=True):
+        if isinstance(outcome, Exception):
+            logger.error(f"Warm-up step failed: {outcome}")
+    logger.info(f"Warm-up finished in {time.perf_counter() - started_at:.2f}s")
+
+def _cache_metrics():
+    """Export the LRU counters the caches already keep, read at scrape time."""
+    caches = {"pdf_text": get_text_cache_stats()}
+    # A scrape must not construct services; report only the ones already in use
+    analysis_agent = _services.get("analysis_agent")
+    if analysis_agent is not None:
+        caches["analysis"] = analysis_agent.result_cache.memory.stats()
+        caches["history_summary"] = analysis_agent.prompt_builder.summaries.stats()
+    if "report_store" in _services:
+        caches["report_context"] = _services["report_store"].cache.stats()
+    if "auth_service" in _services:
+        caches["messages"] = _services["auth_service"].message_cache.stats()
+    for field, kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"), ("entries", "gauge")):
+        suffix = "" if kind == "gauge" else "_total"
+        yield (
+            f"sage_cache_{field}{suffix}", kind, f"In-memory cache {field}.",
+            [({"cache": name}, stats[field]) for name, stats in caches.items()],
+        )
+
+metrics.register_collector(_cache_metrics)
 
 # --- Pydantic Models ---
 class SignUpRequest(BaseModel):
@@ -57,35 +256,83 @@ class LoginRequest(BaseModel):
 class FollowUpRequest(BaseModel):
     prompt: str
     session_id: str
-    report_context: dict
+    report_context: Optional[dict] = None
+
+class BulkDeleteSessionsRequest(BaseModel):
+    session_ids: Optional[List[UUID]] = None
+    all: bool = False
 
 class RiskScoreRequest(BaseModel):
-    report_context: dict
+    session_id: Optional[str] = None
+    report_context: Optional[dict] = None
+    justify: bool = False
+
+class RiskScoreBatchRequest(BaseModel):
+    report_contexts: List[dict]
+
+class BatchPatient(BaseModel):
+    patient_name: str
+    age: int
+    gender: str
+    session_id: str
 
 # --- API Endpoints ---
+def _bearer_token(request: Request):
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    return token.strip() if scheme.lower() == "bearer" else None
+
+def get_current_user(request: Request, verifier=Depends(get_token_verifier)):
+    """The caller behind the request's bearer token, verified locally; 401 without a valid one."""
+    success, result = verifier.verify(_bearer_token(request))
+    if not success:
+        raise HTTPException(status_code=401, detail=result, headers={"WWW-Authenticate": "Bearer"})
+    return result
+
 @app.post("/signup")
-async def signup(payload: SignUpRequest):
-    success, result = auth_service.sign_up(payload.email, payload.password, payload.name)
+async def signup(payload: SignUpRequest, auth_service=Depends(get_auth_service)):
+    success, result = await asyncio.to_thread(auth_service.sign_up, payload.email, payload.password, payload.name)
     if not success:
         raise HTTPException(status_code=400, detail=result)
     return {"user": result}
 
 @app.post("/login")
-async def login(payload: LoginRequest):
-    success, result = auth_service.sign_in(payload.email, payload.password)
+async def login(payload: LoginRequest, auth_service=Depends(get_auth_service)):
+    success, result = await asyncio.to_thread(auth_service.sign_in, payload.email, payload.password)
     if not success:
         raise HTTPException(status_code=401, detail=result)
     return {"user": result, "token": result.get("token")}
 
-@app.get("/sessions/{user_id}")
-async def get_sessions(user_id: str):
-    success, sessions = auth_service.get_user_sessions(user_id)
+def _parse_cursor(cursor):
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _paged(response: Response, page):
+    if page["next_cursor"]:
+        response.headers[NEXT_CURSOR_HEADER] = page["next_cursor"]
+    return page["items"]
+
+@app.get("/sessions/{user_id}", summary="A user's sessions, newest first, one page at a time")
+async def get_sessions(
+    user_id: str,
+    response: Response,
+    limit: int = Query(SESSION_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description=f"The {NEXT_CURSOR_HEADER} header of the previous page"),
+    auth_service=Depends(get_auth_service),
+    current_user=Depends(get_current_user),
+):
+    if current_user["id"] != user_id:
+        raise HTTPException(status_code=403, detail="You can only list your own sessions.")
+    success, page = auth_service.get_user_sessions_page(user_id, limit=limit, cursor=_parse_cursor(cursor))
     if not success:
         raise HTTPException(status_code=500, detail="Failed to retrieve sessions.")
-    return sessions
+    return _paged(response, page)
 
 @app.post("/sessions")
-async def create_session(body: Dict[str, str]):
+async def create_session(body: Dict[str, str], auth_service=Depends(get_auth_service)):
     user_id = body.get("user_id")
     if not user_id:
         raise HTTPException(status_code=400, detail="User ID is required.")
@@ -95,98 +342,447 @@ async def create_session(body: Dict[str, str]):
     return session
 
 @app.delete("/sessions/{session_id}")
-async def delete_session(session_id: str):
+async def delete_session(
+    session_id: str,
+    auth_service=Depends(get_auth_service),
+    report_store=Depends(get_report_store),
+):
     success, error = auth_service.delete_session(session_id)
     if not success:
         raise HTTPException(status_code=500, detail=error)
+    report_store.invalidate(session_id)
+    _forget_session_summaries([session_id])
     return {"message": "Session deleted successfully."}
 
-@app.get("/sessions/{session_id}/messages")
-async def get_messages(session_id: str):
-    success, messages = auth_service.get_session_messages(session_id)
+def _forget_session_summaries(session_ids):
+    # A worker that never built the analysis agent holds no summaries to drop
+    analysis_agent = _services.get("analysis_agent")
+    if analysis_agent is not None:
+        for session_id in session_ids:
+            analysis_agent.forget_session(session_id)
+
+def _delete_sessions_in_background(user_id, session_ids):
+    success, result = get_auth_service().delete_sessions(user_id, session_ids)
+    if not success:
+        logger.error(f"Background deletion of sessions for user {user_id} failed: {result}")
+        return
+    report_store = get_report_store()
+    for session_id in result:
+        report_store.invalidate(session_id)
+    _forget_session_summaries(result)
+    logger.info(f"Deleted {len(result)} sessions for user {user_id}")
+
+@app.post("/sessions/delete", status_code=202, summary="Delete many of the caller's sessions, or all of them, in the background")
+async def delete_sessions(
+    payload: BulkDeleteSessionsRequest,
+    background_tasks: BackgroundTasks,
+    current_user=Depends(get_current_user),
+):
+    if payload.all == (payload.session_ids is not None):
+        raise HTTPException(status_code=400, detail="Send either session_ids or all=true.")
+    session_ids = None if payload.all else [str(session_id) for session_id in payload.session_ids]
+    if session_ids is not None and len(session_ids) > MAX_BULK_DELETE_SESSIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_DELETE_SESSIONS} sessions per request.")
+    background_tasks.add_task(_delete_sessions_in_background, current_user["id"], session_ids)
+    return {"message": "Session deletion accepted.", "session_ids": session_ids, "all": payload.all}
+
+@app.get("/sessions/{session_id}/messages", summary="A session's messages in order, one page at a time")
+async def get_messages(
+    session_id: str,
+    response: Response,
+    limit: int = Query(MESSAGE_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description=f"The {NEXT_CURSOR_HEADER} header of the previous page"),
+    view: Literal["full", "preview"] = Query("full", description="'preview' returns a short preview instead of each message's content"),
+    auth_service=Depends(get_auth_service),
+):
+    success, page = auth_service.get_session_messages_page(
+        session_id, limit=limit, cursor=_parse_cursor(cursor), full=view == "full"
+    )
     if not success:
         raise HTTPException(status_code=500, detail="Failed to retrieve messages.")
-    return messages
+    return _paged(response, page)
+
+@app.get("/sessions/{session_id}/messages/{message_id}", summary="One message with its full content")
+async def get_message(session_id: str, message_id: str, auth_service=Depends(get_auth_service)):
+    success, message = auth_service.get_session_message(session_id, message_id)
+    if not success:
+        raise HTTPException(status_code=500, detail="Failed to retrieve the message.")
+    if message is None:
+        raise HTTPException(status_code=404, detail="Message not found.")
+    return message
+
+def _client_identity(request: Request):
+    """
+    Rate-limit key: the user of a valid bearer token, else the client's IP address.
+    Blocking on a token cache miss; call it off the event loop.
+    """
+    token = _bearer_token(request)
+    if token:
+        success, user = get_token_verifier().verify(token)
+        if success:
+            return f"user:{user['id']}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+class _RateLimitCharge:
+    """Tokens taken for one request; failed work hands its share back through ``refund``."""
+
+    def __init__(self, identity, endpoint, cost):
+        self.identity = identity
+        self.endpoint = endpoint
+        self.outstanding = cost
+
+    async def refund(self, cost=None):
+        cost = self.outstanding if cost is None else min(cost, self.outstanding)
+        if cost > 0:
+            self.outstanding -= cost
+            await asyncio.to_thread(get_rate_limiter().refund, self.identity, self.endpoint, cost)
+
+    @asynccontextmanager
+    async def refund_on_error(self):
+        try:
+            yield self
+        except Exception:
+            await self.refund()
+            raise
+
+def _acquire(request: Request, endpoint, cost):
+    identity = _client_identity(request)
+    return identity, get_rate_limiter().acquire(identity, endpoint, cost)
+
+async def _enforce_rate_limit(request: Request, endpoint, cost=1):
+    identity, (allowed, retry_after) = await asyncio.to_thread(_acquire, request, endpoint, cost)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded. Please retry in {retry_after} seconds.",
+            headers={"Retry-After": str(retry_after)},
+        )
+    return _RateLimitCharge(identity, endpoint, cost)
+
+async def _spool_upload(file: UploadFile):
+    """Read an uploaded report in chunks: size-capped, checked for a PDF header, hashed, spooled."""
+    try:
+        return await asyncio.to_thread(spool_pdf, file.file)
+    except UploadRejected as e:
+        detail = f"{file.filename}: {e.detail}" if file.filename else e.detail
+        raise HTTPException(status_code=e.status_code, detail=detail)
+
+def _client_report_context(report_data, session_id):
+    """What /analyze/initial hands back to the client: the patient fields, not the report text."""
+    return {key: value for key, value in report_data.items() if key != "report"} | {"session_id": session_id}
+
+async def _resolve_report_context(session_id, report_context, report_store):
+    """Use a full report context posted by the client, otherwise load the session's stored one."""
+    if report_context and report_context.get("report"):
+        return report_context
+    session_id = session_id or (report_context or {}).get("session_id")
+    if not session_id:
+        raise HTTPException(status_code=400, detail="A session ID or a report context is required.")
+    stored = await report_store.get(session_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="No report found for this session. Please run an initial analysis first.")
+    return stored
 
 @app.post("/analyze/initial", summary="Perform initial analysis of a report")
 async def analyze_initial(
+    request: Request,
     patient_name: str = Form(...),
     age: int = Form(...),
     gender: str = Form(...),
     session_id: str = Form(...),
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    message_writer=Depends(get_message_writer),
+    analysis_agent=Depends(get_analysis_agent),
+    report_store=Depends(get_report_store),
 ):
-    pdf_contents = extract_text_from_pdf(file.file)
-    if "error" in pdf_contents.lower():
-        raise HTTPException(status_code=400, detail=pdf_contents)
-        
-    report_data = { "patient_name": patient_name, "age": age, "gender": gender, "report": pdf_contents }
-    
-    user_message = f"Analyzing report for patient: {patient_name}, Age: {age}, Gender: {gender}."
-    auth_service.save_chat_message(session_id, user_message, "user")
+    # Only analyses that go through count against the daily quota
+    charge = await _enforce_rate_limit(request, "analyze_initial")
+    async with charge.refund_on_error():
+        with await _spool_upload(file) as pdf:
+            is_valid, pdf_contents = await extract_report_async(pdf)
+        if not is_valid:
+            raise HTTPException(status_code=400, detail=pdf_contents)
 
-    result = analysis_agent.analyze_report(
-        data=report_data, system_prompt=SPECIALIST_PROMPTS["comprehensive_analyst"]
-    )
-    if not result["success"]:
-        raise HTTPException(status_code=500, detail=result["error"])
-        
-    auth_service.save_chat_message(session_id, result["content"], "assistant")
-    return {"analysis": result, "report_context": report_data}
+        report_data = { "patient_name": patient_name, "age": age, "gender": gender, "report": pdf_contents }
+
+        user_message = f"Analyzing report for patient: {patient_name}, Age: {age}, Gender: {gender}."
+        message_writer.enqueue(session_id, user_message, "user")
+
+        result = await analysis_agent.aanalyze_report(
+            data=report_data, system_prompt=SPECIALIST_PROMPTS["comprehensive_analyst"], use_cache=True, task="analysis"
+        )
+        if not result["success"]:
+            raise HTTPException(status_code=500, detail=result["error"])
+
+    message_writer.enqueue(session_id, result["content"], "assistant")
+    await report_store.put(session_id, report_data)
+    return {"analysis": result, "report_context": _client_report_context(report_data, session_id)}
 
 @app.post("/analyze/followup")
-async def analyze_followup(payload: FollowUpRequest):
-    auth_service.save_chat_message(payload.session_id, payload.prompt, "user")
-    success, messages = auth_service.get_session_messages(payload.session_id)
+async def analyze_followup(
+    payload: FollowUpRequest,
+    request: Request,
+    auth_service=Depends(get_auth_service),
+    message_writer=Depends(get_message_writer),
+    analysis_agent=Depends(get_analysis_agent),
+    report_store=Depends(get_report_store),
+):
+    await _enforce_rate_limit(request, "analyze_followup")
+    report_context = await _resolve_report_context(payload.session_id, payload.report_context, report_store)
+    message_writer.enqueue(payload.session_id, payload.prompt, "user")
+    success, messages = auth_service.get_recent_messages(payload.session_id)
     chat_history = messages if success else []
     
     follow_up_data = { 
-        **payload.report_context, 
+        **report_context, 
         "question": payload.prompt 
     }
     
-    result = analysis_agent.analyze_report(
+    result = await analysis_agent.aanalyze_report(
         data=follow_up_data,
         system_prompt=SPECIALIST_PROMPTS["comprehensive_analyst"],
-        chat_history=chat_history
+        chat_history=chat_history,
+        session_id=payload.session_id,
+        task="chat"
     )
     if not result["success"]:
         raise HTTPException(status_code=500, detail=result["error"])
         
-    auth_service.save_chat_message(payload.session_id, result["content"], "assistant")
+    message_writer.enqueue(payload.session_id, result["content"], "assistant")
     return {"response": result}
 
-@app.post("/analyze/risk-score", summary="Generate personalized health risk scores")
-async def analyze_risk_score(payload: RiskScoreRequest):
+def _sse_event(event):
+    """Format an agent stream event as a Server-Sent Events frame."""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+async def _stream_and_persist(session_id, events, message_writer, extra_done=None, charge=None):
+    """
+    Relay agent stream events as SSE and persist the assistant reply once complete.
+    A ``charge`` is refunded if the stream ends in an error instead of an answer.
+    """
+    async for event in events:
+        if event["type"] == "error" and charge is not None:
+            await charge.refund()
+        if event["type"] == "done":
+            message_writer.enqueue(session_id, event["content"], "assistant")
+            if extra_done:
+                event = {**event, **extra_done}
+        yield _sse_event(event)
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.post("/analyze/initial/stream", summary="Stream the initial analysis of a report as Server-Sent Events")
+async def analyze_initial_stream(
+    request: Request,
+    patient_name: str = Form(...),
+    age: int = Form(...),
+    gender: str = Form(...),
+    session_id: str = Form(...),
+    file: UploadFile = File(...),
+    message_writer=Depends(get_message_writer),
+    analysis_agent=Depends(get_analysis_agent),
+    report_store=Depends(get_report_store),
+):
+    charge = await _enforce_rate_limit(request, "analyze_initial")
+    async with charge.refund_on_error():
+        with await _spool_upload(file) as pdf:
+            is_valid, pdf_contents = await extract_report_async(pdf)
+        if not is_valid:
+            raise HTTPException(status_code=400, detail=pdf_contents)
+
+    report_data = { "patient_name": patient_name, "age": age, "gender": gender, "report": pdf_contents }
+
+    user_message = f"Analyzing report for patient: {patient_name}, Age: {age}, Gender: {gender}."
+    message_writer.enqueue(session_id, user_message, "user")
+
+    await report_store.put(session_id, report_data)
+
+    events = analysis_agent.astream_report(
+        data=report_data, system_prompt=SPECIALIST_PROMPTS["comprehensive_analyst"], task="analysis"
+    )
+    return StreamingResponse(
+        _stream_and_persist(
+            session_id, events, message_writer,
+            extra_done={"report_context": _client_report_context(report_data, session_id)}, charge=charge,
+        ),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+@app.post("/analyze/followup/stream", summary="Stream a follow-up answer as Server-Sent Events")
+async def analyze_followup_stream(
+    payload: FollowUpRequest,
+    request: Request,
+    auth_service=Depends(get_auth_service),
+    message_writer=Depends(get_message_writer),
+    analysis_agent=Depends(get_analysis_agent),
+    report_store=Depends(get_report_store),
+):
+    await _enforce_rate_limit(request, "analyze_followup")
+    report_context = await _resolve_report_context(payload.session_id, payload.report_context, report_store)
+    message_writer.enqueue(payload.session_id, payload.prompt, "user")
+    success, messages = auth_service.get_recent_messages(payload.session_id)
+    chat_history = messages if success else []
+
+    follow_up_data = {
+        **report_context,
+        "question": payload.prompt
+    }
+
+    events = analysis_agent.astream_report(
+        data=follow_up_data,
+        system_prompt=SPECIALIST_PROMPTS["comprehensive_analyst"],
+        chat_history=chat_history,
+        session_id=payload.session_id,
+        task="chat"
+    )
+    return StreamingResponse(
+        _stream_and_persist(payload.session_id, events, message_writer),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+@app.post("/analyze/batch", summary="Analyze many reports; results stream back as NDJSON as each completes")
+async def analyze_batch(
+    request: Request,
+    patients: str = Form(..., description="JSON array of patient records, one per file, in the same order"),
+    files: List[UploadFile] = File(...),
+    batch_pipeline=Depends(get_batch_pipeline),
+):
+    try:
+        records = [BatchPatient(**record) for record in json.loads(patients)]
+    except (json.JSONDecodeError, TypeError, ValidationError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid patients payload: {e}")
+    if len(records) != len(files):
+        raise HTTPException(status_code=400, detail="Each file needs exactly one patient record.")
+    if len(files) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A batch may contain at most {BATCH_MAX_ITEMS} reports.")
+    if len(files) > ANALYSIS_DAILY_LIMIT:
+        raise HTTPException(status_code=400, detail=f"A batch counts against the daily limit of {ANALYSIS_DAILY_LIMIT} analyses.")
+    # Same daily budget as single analyses, one token per report; failed reports are refunded
+    charge = await _enforce_rate_limit(request, "analyze_initial", cost=len(files))
+
+    items = []
+    try:
+        for index, (record, file) in enumerate(zip(records, files)):
+            items.append({"index": index, "filename": file.filename, "pdf": await _spool_upload(file), **record.model_dump()})
+    except HTTPException:
+        for item in items:
+            item["pdf"].close()
+        await charge.refund()
+        raise
+
+    async def results():
+        try:
+            async for result in batch_pipeline.run(items):
+                if not result["success"]:
+                    await charge.refund(1)
+                yield json.dumps(result) + "\n"
+        finally:
+            for item in items:
+                item["pdf"].close()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+def _parse_json_object(content):
+    """Parse a JSON object from model output, tolerating text around it."""
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        json_match = re.search(r'\{.*\}', content, re.DOTALL)
+        if json_match:
+            json_str = json_match.group(0)
+            try:
+                return json.loads(json_str)
+            except json.JSONDecodeError:
+                raise HTTPException(status_code=500, detail="AI returned a malformed JSON object.")
+        else:
+            raise HTTPException(status_code=500, detail="AI did not return a valid JSON object.")
+
+async def _llm_risk_scores(report_context):
+    """Ask the model for risk scores; used when the report has no markers the local engine can read."""
     try:
-        result = analysis_agent.analyze_report(
-            data=payload.report_context,
-            system_prompt=SPECIALIST_PROMPTS["risk_scorer"]
+        analysis_agent = await asyncio.to_thread(get_analysis_agent)
+        result = await analysis_agent.aanalyze_report(
+            data=report_context,
+            system_prompt=SPECIALIST_PROMPTS["risk_scorer"],
+            use_cache=True,
+            task="chat"
         )
         if not result["success"]:
             raise HTTPException(status_code=500, detail=result.get("error", "AI model failed to generate risk scores."))
 
-        content = result["content"]
-        
-        try:
-            risk_scores = json.loads(content)
-            return risk_scores
-        except json.JSONDecodeError:
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-                try:
-                    risk_scores = json.loads(json_str)
-                    return risk_scores
-                except json.JSONDecodeError:
-                    raise HTTPException(status_code=500, detail="AI returned a malformed JSON object.")
-            else:
-                raise HTTPException(status_code=500, detail="AI did not return a valid JSON object.")
+        return _parse_json_object(result["content"])
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
+async def _llm_justify(report_context, risk_scores):
+    """Replace the engine's justifications with model-written ones, keeping the computed scores."""
+    system_prompt = f"{SPECIALIST_PROMPTS['risk_justifier']}\n\nrisk_scores: {json.dumps(risk_scores)}"
+    analysis_agent = await asyncio.to_thread(get_analysis_agent)
+    result = await analysis_agent.aanalyze_report(data=report_context, system_prompt=system_prompt, use_cache=True, task="chat")
+    if not result["success"]:
+        return risk_scores
+    try:
+        justified = _parse_json_object(result["content"])
+    except HTTPException:
+        return risk_scores
+
+    merged = {}
+    for category, entry in risk_scores.items():
+        justification = (justified.get(category) or {}).get("justification") if isinstance(justified, dict) else None
+        merged[category] = {**entry, "justification": justification} if isinstance(justification, str) else entry
+    return merged
+
+@app.post("/analyze/risk-score", summary="Generate personalized health risk scores")
+async def analyze_risk_score(
+    payload: RiskScoreRequest,
+    request: Request,
+    risk_engine=Depends(get_risk_engine),
+    report_store=Depends(get_report_store),
+):
+    await _enforce_rate_limit(request, "risk_score")
+    report_context = await _resolve_report_context(payload.session_id, payload.report_context, report_store)
+    if not risk_engine.has_markers(report_context):
+        return await _llm_risk_scores(report_context)
+
+    risk_scores = risk_engine.score(report_context)
+    if payload.justify:
+        risk_scores = await _llm_justify(report_context, risk_scores)
+    return risk_scores
+
+@app.post("/analyze/risk-score/batch", summary="Score many reports locally in a single call")
+async def analyze_risk_score_batch(payload: RiskScoreBatchRequest, risk_engine=Depends(get_risk_engine)):
+    return {"results": risk_engine.score_batch(payload.report_contexts)}
+
+@app.get("/cache/stats", summary="Hit/miss counters for the extraction and analysis caches")
+async def cache_stats():
+    # Only caches already built in this worker; a stats poll never builds a service
+    stats = {"pdf_text": get_text_cache_stats()}
+    analysis_agent = _services.get("analysis_agent")
+    if analysis_agent is not None:
+        stats["analysis"] = analysis_agent.result_cache.memory.stats()
+    return stats
+
+@app.get("/metrics", summary="Prometheus metrics for this worker process", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/models/health", summary="Circuit state, EWMA latency and error rate per model")
+async def models_health():
+    # Empty until this worker has built the model stack for a request
+    analysis_agent = _services.get("analysis_agent")
+    return {"models": analysis_agent.model_manager.health_snapshot() if analysis_agent is not None else []}
+
+IMPORT_SECONDS = time.perf_counter() - _import_started_at
+metrics.IMPORT_SECONDS.set(IMPORT_SECONDS)
+logger.info(f"API module imported in {IMPORT_SECONDS:.3f}s")
+
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("api:app", host="0.0.0.0", port=8000, reload=True)
 
 
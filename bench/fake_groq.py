@@ -0,0 +1,157 @@
+"""
+Local stand-in for the Groq (OpenAI-compatible) chat completions API.
+
+Point the API at it with GROQ_BASE_URL=http://127.0.0.1:<port>. Latency, errors
+and rate limits are injected per request so the model cascade, health tracking
+and retries can be exercised without a real key.
+
+    python -m bench.fake_groq --port 8101 --latency-ms 400 --rate-limit-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+RISK_CATEGORIES = ("cardiovascular", "diabetes", "liver")
+
+FILLER = (
+    "Hemoglobin and the complete blood count are within the reference range. "
+    "Fasting glucose is normal, and the lipid profile shows borderline triglycerides. "
+    "Liver enzymes are unremarkable. Keep up regular exercise and a balanced diet. "
+)
+
+
+def _prompt_tokens(messages):
+    return sum(math.ceil(len(m.get("content") or "") / 4) + 4 for m in messages)
+
+
+def _content(messages, completion_tokens):
+    system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+    if "JSON" in system:
+        return json.dumps({
+            category: {"score": random.randint(5, 60), "justification": f"Synthetic {category} justification."}
+            for category in RISK_CATEGORIES
+        })
+    words = FILLER.split()
+    return " ".join(words[i % len(words)] for i in range(completion_tokens))
+
+
+def create_app(latency_ms=300.0, jitter_ms=100.0, error_rate=0.0, rate_limit_rate=0.0,
+               completion_tokens=300, tokens_per_second=800.0):
+    app = FastAPI(title="Fake Groq")
+
+    async def _delay():
+        await asyncio.sleep(max(0.0, random.gauss(latency_ms, jitter_ms)) / 1000)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/openai/v1/models")
+    async def models():
+        return {"object": "list", "data": []}
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "unknown")
+        messages = body.get("messages", [])
+
+        await _delay()
+        roll = random.random()
+        if roll < rate_limit_rate:
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after": "1"},
+                content={"error": {
+                    "message": f"Rate limit reached for model `{model}`. Please try again in 1s.",
+                    "type": "tokens",
+                    "code": "rate_limit_exceeded",
+                }},
+            )
+        if roll < rate_limit_rate + error_rate:
+            return JSONResponse(status_code=503, content={"error": {"message": "Service unavailable (injected)", "type": "internal_server_error"}})
+
+        output_tokens = min(completion_tokens, body.get("max_tokens") or completion_tokens)
+        content = _content(messages, output_tokens)
+        prompt_tokens = _prompt_tokens(messages)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": output_tokens,
+            "total_tokens": prompt_tokens + output_tokens,
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        async def events():
+            pieces = content.split(" ")
+            delay = 1 / tokens_per_second if tokens_per_second else 0
+            for index, piece in enumerate(pieces):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": piece if index == 0 else " " + piece}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                if delay:
+                    await asyncio.sleep(delay)
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "x_groq": {"id": completion_id, "usage": usage},
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--completion-tokens", type=int, default=300)
+    parser.add_argument("--tokens-per-second", type=float, default=800.0, help="Streaming speed; 0 disables pacing")
+    args = parser.parse_args()
+
+    app = create_app(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        completion_tokens=args.completion_tokens,
+        tokens_per_second=args.tokens_per_second,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
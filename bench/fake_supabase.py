@@ -0,0 +1,349 @@
+"""
+Local stand-in for the parts of Supabase the API uses: GoTrue password auth
+(/auth/v1) and a PostgREST-style table API (/rest/v1) over in-memory tables.
+
+Foreign keys, ON DELETE CASCADE and generated columns follow public/db/migrations,
+so write-behind failures and session deletes behave like the real schema. Access
+tokens are HS256 JWTs signed with --jwt-secret.
+
+    python -m bench.fake_supabase --port 8102 --latency-ms 15 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+from src.config.app_config import MESSAGE_PREVIEW_CHARS
+
+PRIMARY_KEYS = {
+    "users": "id",
+    "chat_sessions": "id",
+    "chat_messages": "id",
+    "report_contexts": "session_id",
+}
+GENERATED_IDS = {"chat_sessions", "chat_messages"}
+# child table -> (column, parent table, parent column); all ON DELETE CASCADE
+FOREIGN_KEYS = {
+    "chat_sessions": ("user_id", "users", "id"),
+    "chat_messages": ("session_id", "chat_sessions", "id"),
+    "report_contexts": ("session_id", "chat_sessions", "id"),
+}
+# Stored generated columns: table -> {column: fn(row)}
+GENERATED_COLUMNS = {
+    "chat_messages": {"preview": lambda row: (row.get("content") or "")[:MESSAGE_PREVIEW_CHARS]},
+}
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def make_jwt(claims, secret):
+    header = _b64(json.dumps({"alg": "HS256", "typ": "JWT"}).encode())
+    payload = _b64(json.dumps(claims).encode())
+    signature = hmac.new(secret.encode(), f"{header}.{payload}".encode(), hashlib.sha256).digest()
+    return f"{header}.{payload}.{_b64(signature)}"
+
+
+def _split_top_level(text):
+    parts, depth, current = [], 0, ""
+    for char in text:
+        if char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        depth += char == "("
+        depth -= char == ")"
+        current += char
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _unquote(value):
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+
+def _coerce(row_value, raw):
+    if isinstance(row_value, bool):
+        return raw == "true"
+    if isinstance(row_value, (int, float)):
+        try:
+            return type(row_value)(raw)
+        except ValueError:
+            return raw
+    return raw
+
+
+def _compare(row_value, operator, raw):
+    if operator == "is":
+        return (row_value is None) if raw == "null" else (str(row_value).lower() == raw)
+    if operator == "in":
+        options = [_unquote(v) for v in _split_top_level(raw.strip("()"))]
+        return row_value is not None and str(row_value) in options
+    if row_value is None:
+        return False
+    value = _coerce(row_value, _unquote(raw))
+    if isinstance(row_value, str):
+        row_value, value = str(row_value), str(value)
+    return {
+        "eq": lambda: row_value == value,
+        "neq": lambda: row_value != value,
+        "lt": lambda: row_value < value,
+        "lte": lambda: row_value <= value,
+        "gt": lambda: row_value > value,
+        "gte": lambda: row_value >= value,
+    }[operator]()
+
+
+def _condition(expression):
+    """Parse one PostgREST logic-tree item such as ``created_at.lt.X`` or ``and(a.eq.1,b.lt.2)``."""
+    for group in ("and", "or"):
+        if expression.startswith(f"{group}(") and expression.endswith(")"):
+            return _group(group, expression[len(group) + 1:-1])
+    column, operator, raw = expression.split(".", 2)
+    return lambda row: _compare(row.get(column), operator, raw)
+
+
+def _group(kind, body):
+    conditions = [_condition(part) for part in _split_top_level(body)]
+    combine = all if kind == "and" else any
+    return lambda row: combine(condition(row) for condition in conditions)
+
+
+def _filters(params):
+    conditions = []
+    for key, value in params.multi_items():
+        if key in RESERVED_PARAMS:
+            continue
+        if key in ("or", "and"):
+            conditions.append(_group(key, value[1:-1]))
+            continue
+        operator, _, raw = value.partition(".")
+        conditions.append(lambda row, c=key, o=operator, r=raw: _compare(row.get(c), o, r))
+    return conditions
+
+
+def _order(rows, order):
+    for term in reversed(order.split(",")):
+        column, *flags = term.split(".")
+        descending = "desc" in flags
+        present = [row for row in rows if row.get(column) is not None]
+        missing = [row for row in rows if row.get(column) is None]
+        present.sort(key=lambda row: row[column], reverse=descending)
+        rows = present + missing if "nullsfirst" not in flags else missing + present
+    return rows
+
+
+def _generate(table, row):
+    for column, compute in GENERATED_COLUMNS.get(table, {}).items():
+        row[column] = compute(row)
+    return row
+
+
+def _project(rows, select):
+    if not select or select == "*":
+        return [dict(row) for row in rows]
+    columns = [column.strip() for column in select.split(",")]
+    return [{column: row.get(column) for column in columns} for row in rows]
+
+
+def create_app(latency_ms=10.0, jitter_ms=5.0, error_rate=0.0, jwt_secret="bench-jwt-secret-for-local-runs-only"):
+    app = FastAPI(title="Fake Supabase")
+    tables = {name: {} for name in PRIMARY_KEYS}
+    accounts = {}
+
+    async def _inject():
+        await asyncio.sleep(max(0.0, random.gauss(latency_ms, jitter_ms)) / 1000)
+        if random.random() < error_rate:
+            return JSONResponse(status_code=503, content={"message": "Service unavailable (injected)"})
+        return None
+
+    def _session_payload(user):
+        expires_in = 3600
+        claims = {
+            "sub": user["id"], "email": user["email"], "aud": "authenticated", "role": "authenticated",
+            "iat": int(time.time()), "exp": int(time.time()) + expires_in,
+            "user_metadata": user["user_metadata"],
+        }
+        return {
+            "access_token": make_jwt(claims, jwt_secret),
+            "refresh_token": uuid.uuid4().hex,
+            "expires_in": expires_in,
+            "expires_at": claims["exp"],
+            "token_type": "bearer",
+            "user": user,
+        }
+
+    def _cascade(table, removed):
+        for child, (column, parent, parent_column) in FOREIGN_KEYS.items():
+            if parent != table:
+                continue
+            keys = {row[parent_column] for row in removed}
+            doomed = [row for row in tables[child].values() if row.get(column) in keys]
+            for row in doomed:
+                del tables[child][row[PRIMARY_KEYS[child]]]
+            _cascade(child, doomed)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", "rows": {name: len(rows) for name, rows in tables.items()}}
+
+    @app.post("/auth/v1/signup")
+    async def signup(request: Request):
+        if (failure := await _inject()) is not None:
+            return failure
+        body = await request.json()
+        email = body["email"].lower()
+        if email in accounts:
+            return JSONResponse(status_code=422, content={"code": "user_already_exists", "msg": "User already registered"})
+        user = {
+            "id": str(uuid.uuid4()), "aud": "authenticated", "role": "authenticated", "email": email,
+            "app_metadata": {"provider": "email"}, "user_metadata": body.get("data") or {},
+            "created_at": _now(),
+        }
+        accounts[email] = {"password": body["password"], "user": user}
+        return _session_payload(user)
+
+    @app.post("/auth/v1/token")
+    async def token(request: Request):
+        if (failure := await _inject()) is not None:
+            return failure
+        body = await request.json()
+        account = accounts.get((body.get("email") or "").lower())
+        if account is None or account["password"] != body.get("password"):
+            return JSONResponse(status_code=400, content={"error": "invalid_grant", "error_description": "Invalid login credentials"})
+        return _session_payload(account["user"])
+
+    @app.get("/auth/v1/user")
+    async def user(request: Request):
+        if (failure := await _inject()) is not None:
+            return failure
+        token = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.split(".")[1] + "=="))
+        except Exception:
+            return JSONResponse(status_code=401, content={"msg": "invalid JWT"})
+        account = next((a for a in accounts.values() if a["user"]["id"] == payload.get("sub")), None)
+        if account is None:
+            return JSONResponse(status_code=401, content={"msg": "User not found"})
+        return account["user"]
+
+    @app.get("/rest/v1/{table}")
+    async def select(table: str, request: Request):
+        if (failure := await _inject()) is not None:
+            return failure
+        params = request.query_params
+        conditions = _filters(params)
+        rows = [row for row in tables[table].values() if all(condition(row) for condition in conditions)]
+        if "order" in params:
+            rows = _order(rows, params["order"])
+        offset = int(params.get("offset", 0))
+        if "limit" in params:
+            rows = rows[offset:offset + int(params["limit"])]
+        else:
+            rows = rows[offset:]
+        return _project(rows, params.get("select"))
+
+    @app.post("/rest/v1/{table}")
+    async def insert(table: str, request: Request):
+        if (failure := await _inject()) is not None:
+            return failure
+        body = await request.json()
+        rows = body if isinstance(body, list) else [body]
+        prefer = request.headers.get("prefer", "")
+        upsert = "resolution=merge-duplicates" in prefer
+        primary_key = request.query_params.get("on_conflict") or PRIMARY_KEYS[table]
+
+        staged = []
+        for row in rows:
+            row = dict(row)
+            if table in GENERATED_IDS:
+                row.setdefault("id", str(uuid.uuid4()))
+            row.setdefault("created_at", _now())
+            fk = FOREIGN_KEYS.get(table)
+            if fk and row.get(fk[0]) not in {parent[fk[2]] for parent in tables[fk[1]].values()}:
+                return JSONResponse(status_code=409, content={
+                    "code": "23503", "message": f'insert or update on table "{table}" violates foreign key constraint',
+                })
+            if row[primary_key] in tables[table] and not upsert:
+                return JSONResponse(status_code=409, content={
+                    "code": "23505", "message": f'duplicate key value violates unique constraint "{table}_pkey"',
+                })
+            staged.append(row)
+
+        # All-or-nothing, like a single INSERT statement
+        for row in staged:
+            existing = tables[table].get(row[primary_key], {})
+            tables[table][row[primary_key]] = _generate(table, {**existing, **row})
+        if "return=representation" in prefer:
+            return JSONResponse(status_code=201, content=[tables[table][row[primary_key]] for row in staged])
+        return Response(status_code=201)
+
+    @app.patch("/rest/v1/{table}")
+    async def update(table: str, request: Request):
+        if (failure := await _inject()) is not None:
+            return failure
+        changes = await request.json()
+        conditions = _filters(request.query_params)
+        updated = []
+        for row in tables[table].values():
+            if all(condition(row) for condition in conditions):
+                row.update(changes)
+                updated.append(_generate(table, row))
+        if "return=representation" in request.headers.get("prefer", ""):
+            return updated
+        return Response(status_code=204)
+
+    @app.delete("/rest/v1/{table}")
+    async def delete(table: str, request: Request):
+        if (failure := await _inject()) is not None:
+            return failure
+        conditions = _filters(request.query_params)
+        removed = [row for row in tables[table].values() if all(condition(row) for condition in conditions)]
+        for row in removed:
+            del tables[table][row[PRIMARY_KEYS[table]]]
+        _cascade(table, removed)
+        if "return=representation" in request.headers.get("prefer", ""):
+            return removed
+        return Response(status_code=204)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8102)
+    parser.add_argument("--latency-ms", type=float, default=10.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--jwt-secret", default="bench-jwt-secret-for-local-runs-only")
+    args = parser.parse_args()
+
+    app = create_app(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        jwt_secret=args.jwt_secret,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Synthetic blood-report PDFs for the benchmark, built from SAMPLE_REPORT.
+
+Each variant scales the biomarker values by a random factor so reports differ
+(and miss the text/analysis caches) while still parsing like the real sample.
+"""
+import random
+import re
+
+from src.config.sample_data import SAMPLE_REPORT
+
+_VALUE = re.compile(r"(?<=: )(\d[\d,]*(?:\.\d+)?)")
+
+
+def make_pdf(pages):
+    """Minimal PDF with one Helvetica text page per list of lines."""
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(b"")
+    kids = []
+    for lines in pages:
+        escaped = (line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines)
+        stream = ("BT /F1 10 Tf 40 780 Td 12 TL " + " ".join(f"({line}) '" for line in escaped) + " ET")
+        data = stream.encode("latin-1", "replace")
+        content = add(b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content, font)
+        ))
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), len(kids)
+    )
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return out
+
+
+def report_variant(rng):
+    """SAMPLE_REPORT with every biomarker value scaled by 0.7-1.4x."""
+    def scale(match):
+        raw = match.group(1).replace(",", "")
+        value = float(raw) * rng.uniform(0.7, 1.4)
+        return f"{value:.1f}" if "." in raw else str(round(value))
+
+    lines = []
+    # The base-14 Helvetica font has no glyph for the micro sign
+    for line in SAMPLE_REPORT.replace("µ", "u").splitlines():
+        head, sep, reference = line.partition("(Reference")
+        lines.append(_VALUE.sub(scale, head) + sep + reference)
+    return lines
+
+
+def report_pdfs(count, pages=1, seed=7):
+    """``count`` distinct report PDFs of ``pages`` pages, one report variant per page."""
+    rng = random.Random(seed)
+    return [make_pdf([report_variant(rng) for _ in range(pages)]) for _ in range(count)]
@@ -0,0 +1,339 @@
+"""
+Offline load benchmark for the Sage API.
+
+Starts the fake Groq and Supabase servers and `uvicorn api:app` wired to them,
+then drives a weighted mix of signup/login/initial/follow-up/risk-score traffic
+from concurrent virtual users and reports latency percentiles and throughput
+per endpoint.
+
+    python -m bench.run --duration 30 --concurrency 16
+    python -m bench.run --mix initial=1,followup=4 --llm-latency-ms 800 --json results.json
+    python -m bench.run --baseline results.json --tolerance 0.2   # exit 1 on regression
+
+Each virtual user signs up, logs in and opens a session, then loops over the mix.
+Requests carry the user's bearer token, so per-user rate limits apply; a user
+that gets a 429 is replaced by a freshly signed-up one.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+from bench.reports import report_pdfs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MIX = "signup=1,login=2,initial=2,followup=6,followup_stream=2,risk_score=3,sidebar=2"
+JWT_SECRET = "bench-jwt-secret-for-local-runs-only"
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _spawn(args, env, log_path):
+    log = open(log_path, "w")
+    return subprocess.Popen(args, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def _wait_ready(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+
+    def record(self, endpoint, seconds, status):
+        self.samples.setdefault(endpoint, []).append((seconds, status))
+
+    def summary(self, elapsed):
+        results = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            ok = sorted(seconds for seconds, status in samples if status < 400)
+            results[endpoint] = {
+                "requests": len(samples),
+                "ok": len(ok),
+                "rate_limited": sum(status == 429 for _, status in samples),
+                "errors": sum(status >= 400 and status != 429 for _, status in samples),
+                "rps": round(len(ok) / elapsed, 2),
+                "p50_ms": round(_percentile(ok, 0.50) * 1000, 1),
+                "p95_ms": round(_percentile(ok, 0.95) * 1000, 1),
+                "p99_ms": round(_percentile(ok, 0.99) * 1000, 1),
+            }
+        return results
+
+
+class VirtualUser:
+    def __init__(self, client, recorder, pdfs, rng):
+        self.client = client
+        self.recorder = recorder
+        self.pdfs = pdfs
+        self.rng = rng
+        self.user_id = None
+        self.email = None
+        self.password = "Bench-Passw0rd"
+        self.session_id = None
+        self.analyzed = False
+        self.token = None
+
+    async def _call(self, endpoint, method, path, **kwargs):
+        headers = kwargs.pop("headers", {})
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        started_at = time.perf_counter()
+        try:
+            if kwargs.pop("stream", False):
+                async with self.client.stream(method, path, headers=headers, **kwargs) as response:
+                    async for _ in response.aiter_raw():
+                        pass
+            else:
+                response = await self.client.request(method, path, headers=headers, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, 599
+        self.recorder.record(endpoint, time.perf_counter() - started_at, status)
+        if status == 429:
+            await self.signup()
+        return response if status < 400 else None
+
+    async def signup(self):
+        self.email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+        self.user_id = None
+        self.token = None
+        response = await self._call("signup", "POST", "/signup", json={
+            "name": "Bench User", "email": self.email, "password": self.password,
+        })
+        if response is None:
+            return False
+        self.user_id = response.json()["user"]["id"]
+        self.session_id = None
+        self.analyzed = False
+        await self.login()
+        return await self.new_session()
+
+    async def new_session(self):
+        response = await self._call("create_session", "POST", "/sessions", json={"user_id": self.user_id})
+        if response is None:
+            return False
+        self.session_id = response.json()["id"]
+        self.analyzed = False
+        return True
+
+    async def login(self):
+        response = await self._call("login", "POST", "/login", json={"email": self.email, "password": self.password})
+        if response is not None:
+            self.token = response.json()["token"]
+
+    async def sidebar(self):
+        """What the dashboard loads: the first page of sessions and the open session's message previews."""
+        await self._call("list_sessions", "GET", f"/sessions/{self.user_id}")
+        if self.session_id:
+            await self._call("list_messages", "GET", f"/sessions/{self.session_id}/messages", params={"view": "preview"})
+
+    async def initial(self):
+        await self.new_session()
+        response = await self._call(
+            "initial", "POST", "/analyze/initial",
+            data={"patient_name": "Bench Patient", "age": "42", "gender": "female", "session_id": self.session_id},
+            files={"file": ("report.pdf", self.rng.choice(self.pdfs), "application/pdf")},
+        )
+        self.analyzed = response is not None
+
+    async def followup(self):
+        if not self.analyzed:
+            return await self.initial()
+        await self._call("followup", "POST", "/analyze/followup", json={
+            "prompt": "Which of my results should I watch most closely?", "session_id": self.session_id,
+        })
+
+    async def followup_stream(self):
+        if not self.analyzed:
+            return await self.initial()
+        await self._call("followup_stream", "POST", "/analyze/followup/stream", stream=True, json={
+            "prompt": "Summarize my lipid profile.", "session_id": self.session_id,
+        })
+
+    async def risk_score(self):
+        if not self.analyzed:
+            return await self.initial()
+        await self._call("risk_score", "POST", "/analyze/risk-score", json={
+            "session_id": self.session_id, "justify": self.rng.random() < 0.3,
+        })
+
+    async def run(self, mix, deadline):
+        operations, weights = zip(*mix.items())
+        if not await self.signup():
+            return
+        while time.monotonic() < deadline:
+            operation = self.rng.choices(operations, weights)[0]
+            if operation == "signup":
+                await self.signup()
+            else:
+                await getattr(self, operation)()
+
+
+def _parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if not hasattr(VirtualUser, name.strip()):
+            raise SystemExit(f"Unknown operation in --mix: {name}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+async def drive(api_url, mix, concurrency, duration, pdfs, seed):
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2)
+    async with httpx.AsyncClient(base_url=api_url, timeout=120, limits=limits) as client:
+        started_at = time.monotonic()
+        deadline = started_at + duration
+        users = [VirtualUser(client, recorder, pdfs, random.Random(seed + index)) for index in range(concurrency)]
+        await asyncio.gather(*(user.run(mix, deadline) for user in users))
+        elapsed = time.monotonic() - started_at
+    return recorder.summary(elapsed), elapsed
+
+
+def print_table(results, elapsed):
+    header = f"{'endpoint':<18}{'reqs':>7}{'ok':>7}{'429':>6}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for endpoint, stats in results.items():
+        print(
+            f"{endpoint:<18}{stats['requests']:>7}{stats['ok']:>7}{stats['rate_limited']:>6}{stats['errors']:>6}"
+            f"{stats['rps']:>9}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}"
+        )
+    total = sum(stats["ok"] for stats in results.values())
+    print(f"\n{total} successful requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+
+
+def compare(results, baseline, tolerance):
+    """Regressions: p95 slower or throughput lower than the baseline by more than ``tolerance``."""
+    regressions = []
+    for endpoint, stats in results.items():
+        before = baseline.get(endpoint)
+        if not before or not before.get("ok"):
+            continue
+        if stats["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{endpoint}: p95 {before['p95_ms']}ms -> {stats['p95_ms']}ms")
+        if stats["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{endpoint}: rps {before['rps']} -> {stats['rps']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load")
+    parser.add_argument("--concurrency", type=int, default=16, help="Virtual users")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--reports", type=int, default=20, help="Distinct report PDFs to upload")
+    parser.add_argument("--pages", type=int, default=1, help="Pages per report PDF")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--api-workers", type=int, default=1)
+    parser.add_argument("--api-url", help="Benchmark an already running API instead of starting one (fakes are not started)")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=800)
+    parser.add_argument("--db-latency-ms", type=float, default=10)
+    parser.add_argument("--db-error-rate", type=float, default=0.0)
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Results file from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression vs. the baseline")
+    args = parser.parse_args()
+
+    mix = _parse_mix(args.mix)
+    pdfs = report_pdfs(args.reports, pages=args.pages, seed=args.seed)
+    workdir = tempfile.mkdtemp(prefix="sage-bench-")
+    processes = []
+
+    try:
+        api_url = args.api_url
+        if api_url is None:
+            groq_port, supabase_port, api_port = _free_port(), _free_port(), _free_port()
+            env = dict(os.environ)
+            processes.append(_spawn([
+                sys.executable, "-m", "bench.fake_groq", "--port", str(groq_port),
+                "--latency-ms", str(args.llm_latency_ms), "--error-rate", str(args.llm_error_rate),
+                "--rate-limit-rate", str(args.llm_rate_limit_rate), "--tokens-per-second", str(args.llm_tokens_per_second),
+            ], env, os.path.join(workdir, "fake_groq.log")))
+            processes.append(_spawn([
+                sys.executable, "-m", "bench.fake_supabase", "--port", str(supabase_port),
+                "--latency-ms", str(args.db_latency_ms), "--error-rate", str(args.db_error_rate),
+                "--jwt-secret", JWT_SECRET,
+            ], env, os.path.join(workdir, "fake_supabase.log")))
+
+            env.update({
+                "GROQ_API_KEY": "bench",
+                "GROQ_BASE_URL": f"http://127.0.0.1:{groq_port}",
+                "SUPABASE_URL": f"http://127.0.0.1:{supabase_port}",
+                "SUPABASE_KEY": "bench",
+                "SUPABASE_JWT_SECRET": JWT_SECRET,
+                "ANALYSIS_CACHE_DB_PATH": os.path.join(workdir, "analysis_cache.db"),
+                "RATE_LIMIT_DB_PATH": os.path.join(workdir, "rate_limits.db"),
+            })
+            processes.append(_spawn([
+                sys.executable, "-m", "uvicorn", "api:app", "--port", str(api_port),
+                "--workers", str(args.api_workers), "--log-level", "warning",
+            ], env, os.path.join(workdir, "api.log")))
+            api_url = f"http://127.0.0.1:{api_port}"
+
+            async def ready():
+                await _wait_ready(f"http://127.0.0.1:{groq_port}/health")
+                await _wait_ready(f"http://127.0.0.1:{supabase_port}/health")
+                await _wait_ready(f"{api_url}/docs")
+            asyncio.run(ready())
+
+        print(f"Benchmarking {api_url} for {args.duration:.0f}s with {args.concurrency} virtual users (logs: {workdir})\n")
+        results, elapsed = asyncio.run(drive(api_url, mix, args.concurrency, args.duration, pdfs, args.seed))
+        print_table(results, elapsed)
+
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+        if args.baseline:
+            with open(args.baseline) as f:
+                regressions = compare(results, json.load(f), args.tolerance)
+            if regressions:
+                print("\nRegressions against baseline:\n  " + "\n  ".join(regressions))
+                sys.exit(1)
+            print("\nNo regressions against baseline.")
+    finally:
+        # API first, so its write-behind queue can still drain into the fake database
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,12 @@ interface RiskData { cardiovascular: RiskScore; diabetes: RiskScore; liver: Risk
 interface Session { id: string; title: string; createdAt: string; messages: Message[]; reportContext?: any; riskData?: RiskData; }
 type ViewState = 'welcome' | 'analysis-form' | 'chat';
 
+// Analysis quotas are per user; the API identifies the caller by this token
+const authHeaders = (): Record<string, string> => {
+  const token = localStorage.getItem('hiaToken');
+  return token ? { 'Authorization': `Bearer ${token}` } : {};
+};
+
 export default function DashboardPage() {
   const router = useRouter();
   const [user, setUser] = useState<User | null>(null);
@@ -49,24 +55,31 @@ export default function DashboardPage() {
   const fetchSessions = async (userId: string) => {
     try {
       const token = localStorage.getItem('hiaToken');
-      const response = await fetch(`${API_URL}/sessions/${userId}`, {
-        headers: {
-          'Authorization': `Bearer ${token}` // Send the token for authentication
+      // Sessions come in pages, newest first; follow the X-Next-Cursor header to load them all
+      const allSessions: Session[] = [];
+      let cursor: string | null = null;
+      do {
+        const query: string = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+        const response = await fetch(`${API_URL}/sessions/${userId}${query}`, {
+          headers: {
+            'Authorization': `Bearer ${token}` // Send the token for authentication
+          }
+        });
+
+        // --- THIS IS THE FIX ---
+        // If the token is invalid, the server will respond with a 401.
+        // We catch this and log the user out.
+        if (response.status === 401) {
+          handleLogout();
+          return;
         }
-      });
+        // --- END OF FIX ---
 
-      // --- THIS IS THE FIX ---
-      // If the token is invalid, the server will respond with a 401.
-      // We catch this and log the user out.
-      if (response.status === 401) {
-        handleLogout();
-        return;
-      }
-      // --- END OF FIX ---
-      
-      if (!response.ok) throw new Error("Failed to fetch sessions");
-      const data = await response.json();
-      setSessions(data);
+        if (!response.ok) throw new Error("Failed to fetch sessions");
+        allSessions.push(...(await response.json()));
+        cursor = response.headers.get('X-Next-Cursor');
+      } while (cursor);
+      setSessions(allSessions);
     } catch (error: any) {
       setError(error.message);
     }
@@ -100,9 +113,16 @@ export default function DashboardPage() {
     const session = sessions.find(s => s.id === sessionId);
     if (session) {
       try {
-        const response = await fetch(`${API_URL}/sessions/${sessionId}/messages`);
-        if (!response.ok) throw new Error("Failed to fetch messages");
-        const messages = await response.json();
+        // Messages come in pages; follow the X-Next-Cursor header until the history is complete
+        const messages: Message[] = [];
+        let cursor: string | null = null;
+        do {
+          const query: string = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+          const response = await fetch(`${API_URL}/sessions/${sessionId}/messages${query}`);
+          if (!response.ok) throw new Error("Failed to fetch messages");
+          messages.push(...(await response.json()));
+          cursor = response.headers.get('X-Next-Cursor');
+        } while (cursor);
         const firstUserMessage = messages.find((m: Message) => m.role === 'user');
         let reportContext = {};
         if (firstUserMessage) {
@@ -150,7 +170,7 @@ export default function DashboardPage() {
     formData.append('session_id', currentSession.id);
 
     try {
-      const response = await fetch(`${API_URL}/analyze/initial`, { method: 'POST', body: formData });
+      const response = await fetch(`${API_URL}/analyze/initial`, { method: 'POST', headers: authHeaders(), body: formData });
       if (!response.ok) {
         const errData = await response.json();
         if (Array.isArray(errData.detail)) {
@@ -174,7 +194,7 @@ export default function DashboardPage() {
     try {
       const response = await fetch(`${API_URL}/analyze/risk-score`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers: { 'Content-Type': 'application/json', ...authHeaders() },
         body: JSON.stringify({ report_context: reportContext }),
       });
       if (!response.ok) throw new Error("Could not generate risk scores");
@@ -197,7 +217,7 @@ export default function DashboardPage() {
     try {
         const response = await fetch(`${API_URL}/analyze/followup`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: { 'Content-Type': 'application/json', ...authHeaders() },
             body: JSON.stringify({ 
               prompt: message, 
               session_id: currentSession.id,
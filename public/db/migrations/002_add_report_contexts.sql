@@ -0,0 +1,7 @@
+-- Server-side report context per chat session, so follow-ups can reference it by session ID
+CREATE TABLE IF NOT EXISTS report_contexts (
+    session_id UUID PRIMARY KEY,
+    context JSONB NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (session_id) REFERENCES chat_sessions(id) ON DELETE CASCADE
+);
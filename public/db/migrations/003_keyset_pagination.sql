@@ -0,0 +1,11 @@
+-- Keyset pagination on (created_at, id): widen the listing indexes so a page is an index
+-- range scan in the listing order instead of a sort over all of a user's rows
+DROP INDEX IF EXISTS idx_chat_sessions_user_id;
+CREATE INDEX idx_chat_sessions_user_id ON chat_sessions (user_id, created_at DESC, id DESC);
+
+DROP INDEX IF EXISTS idx_chat_messages_session_id;
+CREATE INDEX idx_chat_messages_session_id ON chat_messages (session_id, created_at, id);
+
+-- Short form of each message for list views; full bodies are fetched on demand
+ALTER TABLE chat_messages
+    ADD COLUMN IF NOT EXISTS preview TEXT GENERATED ALWAYS AS (left(content, 200)) STORED;
@@ -0,0 +1,23 @@
+-- Deleting a session removes its messages in the same statement, so sessions can be
+-- deleted in bulk with one DELETE on chat_sessions. The existing foreign key is found
+-- by column rather than by name, since script.sql leaves it to Postgres to name it.
+DO $$
+DECLARE
+    fk record;
+BEGIN
+    FOR fk IN
+        SELECT c.conname
+        FROM pg_constraint c
+        JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = ANY (c.conkey)
+        WHERE c.contype = 'f'
+          AND c.conrelid = 'public.chat_messages'::regclass
+          AND c.confrelid = 'public.chat_sessions'::regclass
+          AND a.attname = 'session_id'
+    LOOP
+        EXECUTE format('ALTER TABLE public.chat_messages DROP CONSTRAINT %I', fk.conname);
+    END LOOP;
+
+    ALTER TABLE public.chat_messages
+        ADD CONSTRAINT chat_messages_session_id_fkey
+            FOREIGN KEY (session_id) REFERENCES public.chat_sessions(id) ON DELETE CASCADE;
+END $$;
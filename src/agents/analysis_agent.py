@@ -1,72 +1,148 @@
-from datetime import datetime, timedelta
+import asyncio
+import hashlib
 # NOTE: We no longer import or use Streamlit here
 from .model_manager import ModelManager
+from .result_cache import AnalysisCache
+from .prompt_builder import PromptBuilder
+from src.config.prompts import SPECIALIST_PROMPTS
+from src.config.app_config import (
+    COMPACT_REPORT_ENABLED,
+    COMPACT_REPORT_MIN_ROWS,
+    SUMMARY_MAX_SESSIONS,
+    SUMMARY_MAX_TOKENS,
+    SUMMARY_TURN_CHARS,
+    HISTORY_MESSAGE_MAX_SHARE,
+)
+from src.utils.biomarker_parser import parse_biomarkers
+from src.utils.metrics import STAGE_SECONDS, ANALYSES_COALESCED
+
+# Reverse lookup so cache keys use a stable prompt name instead of the full prompt text
+PROMPT_NAMES = {prompt: name for name, prompt in SPECIALIST_PROMPTS.items()}
 
 class AnalysisAgent:
     def __init__(self):
         self.model_manager = ModelManager()
-        # State is no longer managed here; it will be handled by the API layer
-        self.analysis_count = 0
-        self.last_analysis = datetime.now()
-        self.analysis_limit = 15
-
-    def check_rate_limit(self):
-        # This logic remains the same but operates on instance variables
-        time_until_reset = timedelta(days=1) - (datetime.now() - self.last_analysis)
-        if time_until_reset.days < 0:
-            self.analysis_count = 0
-            self.last_analysis = datetime.now()
-        
-        if self.analysis_count >= self.analysis_limit:
-            hours, remainder = divmod(time_until_reset.seconds, 3600)
-            minutes, _ = divmod(remainder, 60)
-            return False, f"Daily limit reached. Reset in {hours}h {minutes}m"
-        return True, None
-
-    def analyze_report(self, data, system_prompt, chat_history=None):
-        can_analyze, error_msg = self.check_rate_limit()
-        if not can_analyze:
-            return {"success": False, "error": error_msg}
+        self.result_cache = AnalysisCache()
+        self.prompt_builder = PromptBuilder(
+            max_sessions=SUMMARY_MAX_SESSIONS,
+            summary_max_tokens=SUMMARY_MAX_TOKENS,
+            turn_summary_chars=SUMMARY_TURN_CHARS,
+            message_max_share=HISTORY_MESSAGE_MAX_SHARE,
+        )
+        # Usage limits are enforced per client by the API layer (src.utils.rate_limiter)
+        # Single-flight: identical concurrent analyses share one generation task
+        self._in_flight = {}
 
+    def analyze_report(self, data, system_prompt, chat_history=None, session_id=None, task="default"):
         processed_data = self._preprocess_data(data)
         
         # In a real scenario, knowledge base would be persisted in a DB
         # For now, it's ephemeral
         knowledge_base = {} 
-        enhanced_prompt = self._build_enhanced_prompt(system_prompt, processed_data, chat_history, knowledge_base)
-        
-        result = self.model_manager.generate_analysis(processed_data, enhanced_prompt)
-        
-        if result["success"]:
-            self.analysis_count += 1
-            self.last_analysis = datetime.now()
+        enhanced_prompt = self._build_enhanced_prompt(system_prompt, processed_data, chat_history, knowledge_base, session_id, task)
         
+        return self.model_manager.generate_analysis(processed_data, enhanced_prompt, task=task)
+
+    async def aanalyze_report(self, data, system_prompt, chat_history=None, use_cache=False, session_id=None, task="default"):
+        """
+        Async variant of analyze_report; awaits the model cascade without blocking the event loop.
+        With use_cache, stateless calls (no chat history) are served from the analysis cache
+        when the same preprocessed data was analyzed before, tagged with ``cached: True``.
+        Concurrent calls with the same preprocessed data and final prompt await one shared
+        generation instead of each calling the model.
+        """
+        processed_data = self._preprocess_data(data)
+
+        cache_key = None
+        if use_cache and not chat_history:
+            cache_key = self._cache_key(processed_data, system_prompt, task)
+            cached = await self.result_cache.aget(cache_key)
+            if cached is not None and self._from_preferred_tier(cached, task):
+                return {**cached, "cached": True}
+
+        knowledge_base = {}
+        enhanced_prompt = self._build_enhanced_prompt(system_prompt, processed_data, chat_history, knowledge_base, session_id, task)
+
+        flight_key = self._cache_key(processed_data, enhanced_prompt, task)
+        flight = self._in_flight.get(flight_key)
+        if flight is None:
+            flight = asyncio.ensure_future(self._generate(processed_data, enhanced_prompt, task, cache_key))
+            self._in_flight[flight_key] = flight
+            flight.add_done_callback(lambda done: self._land(flight_key, done))
+        else:
+            ANALYSES_COALESCED.inc()
+        # Shielded so one caller disconnecting doesn't cancel the generation for the others
+        return dict(await asyncio.shield(flight))
+
+    async def _generate(self, processed_data, enhanced_prompt, task, cache_key):
+        with STAGE_SECONDS.time(stage="analysis"):
+            result = await self.model_manager.agenerate_analysis(processed_data, enhanced_prompt, task=task)
+        if cache_key and result["success"] and self._from_preferred_tier(result, task):
+            await self.result_cache.aset(cache_key, result)
         return result
-    
+
+    def _from_preferred_tier(self, result, task):
+        # Cache keys name the task's preferred tier; a fallback model's answer doesn't belong under one
+        return result.get("model_used") == self.model_manager.tier_model(self.model_manager.preferred_tier(task))
+
+    def _land(self, flight_key, flight):
+        if self._in_flight.get(flight_key) is flight:
+            del self._in_flight[flight_key]
+        if not flight.cancelled():
+            flight.exception()  # mark retrieved even if every caller went away
+
+    def _cache_key(self, processed_data, system_prompt, task):
+        prompt_name = PROMPT_NAMES.get(system_prompt)
+        if prompt_name is None:
+            prompt_name = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+        tier = self.model_manager.preferred_tier(task).value
+        return AnalysisCache.make_key(processed_data, prompt_name, tier)
+
+    async def astream_report(self, data, system_prompt, chat_history=None, session_id=None, task="default"):
+        """
+        Streaming variant of aanalyze_report. Yields the model manager's delta events
+        and finishes with a ``done`` event carrying the full assembled content.
+        """
+        processed_data = self._preprocess_data(data)
+        knowledge_base = {}
+        enhanced_prompt = self._build_enhanced_prompt(system_prompt, processed_data, chat_history, knowledge_base, session_id, task)
+
+        parts = []
+        async for event in self.model_manager.astream_analysis(processed_data, enhanced_prompt, task=task):
+            if event["type"] == "delta":
+                parts.append(event["content"])
+            elif event["type"] == "done":
+                event = {**event, "success": True, "content": "".join(parts)}
+            yield event
+
     def _preprocess_data(self, data):
         if isinstance(data, dict):
             return {
                 "patient_name": data.get("patient_name", ""),
                 "age": data.get("age", ""),
                 "gender": data.get("gender", ""),
-                "report": data.get("report", ""),
+                "report": self._condense_report(data.get("report", "")),
                 "question": data.get("question") # Pass question if it exists
             }
         return data
 
-    def _build_enhanced_prompt(self, system_prompt, data, chat_history, knowledge_base):
+    def _condense_report(self, report):
+        """Swap raw report text for the compact biomarker table when it parses cleanly."""
+        if not COMPACT_REPORT_ENABLED or not isinstance(report, str):
+            return report
+        table = parse_biomarkers(report)
+        if len(table) < COMPACT_REPORT_MIN_ROWS:
+            return report
+        return table.to_compact()
+
+    def _build_enhanced_prompt(self, system_prompt, data, chat_history, knowledge_base, session_id=None, task="default"):
       # This function can remain largely the same, but it must not use st.session_state
-      # For simplicity, we'll just use the system prompt and history for now
+      # History is packed to the task's preferred tier budget; older turns go into a rolling summary
       if chat_history:
-          session_context = self._get_session_context(chat_history)
-          if session_context:
-              return f"{system_prompt}\n\n## Current Session History\n{session_context}"
+          return self.prompt_builder.build(
+              system_prompt, data, chat_history, self.model_manager.prompt_budget(task=task), session_id=session_id
+          )
       return system_prompt
 
-    def _get_session_context(self, chat_history):
-        if not chat_history or len(chat_history) < 2:
-            return ""
-        context_items = []
-        for msg in chat_history[-4:]: # Get last 4 messages for context
-            context_items.append(f"{msg['role']}: {msg['content']}")
-        return "\n".join(context_items)
\ No newline at end of file
+    def forget_session(self, session_id):
+        self.prompt_builder.forget(session_id)
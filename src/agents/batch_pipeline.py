@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+
+from src.config.prompts import SPECIALIST_PROMPTS
+from src.utils.pdf_extractor import extract_report_async
+
+logger = logging.getLogger(__name__)
+
+
+class IntervalRateLimiter:
+    """Spaces out calls so that at most ``requests_per_minute`` start in any minute."""
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class BatchPipeline:
+    """
+    Runs many reports through extract -> validate -> analyze -> persist.
+
+    Every stage has its own concurrency bound, and the analyze stage is also
+    paced by a shared rate limiter so a large batch stays under the Groq
+    request quota. Each item succeeds or fails on its own. Results are yielded
+    as soon as each item finishes, not in submission order.
+    """
+
+    def __init__(self, analysis_agent, message_writer, report_store, extract_concurrency, analyze_concurrency,
+                 persist_concurrency, requests_per_minute):
+        self.analysis_agent = analysis_agent
+        self.message_writer = message_writer
+        self.report_store = report_store
+        self.extract_slots = asyncio.Semaphore(extract_concurrency)
+        self.analyze_slots = asyncio.Semaphore(analyze_concurrency)
+        self.persist_slots = asyncio.Semaphore(persist_concurrency)
+        self.rate_limiter = IntervalRateLimiter(requests_per_minute)
+
+    async def run(self, items):
+        """
+        Process items concurrently and yield one result dict per item as it completes.
+
+        Each item is a dict with ``index``, ``filename``, ``pdf`` (bytes or a SpooledPDF),
+        ``patient_name``, ``age``, ``gender`` and ``session_id``.
+        """
+        tasks = [asyncio.create_task(self._process(item)) for item in items]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _process(self, item):
+        base = {"index": item["index"], "filename": item.get("filename")}
+        stage = "extract"
+        try:
+            async with self.extract_slots:
+                is_valid, pdf_contents = await extract_report_async(item["pdf"])
+
+            stage = "validate"
+            if not is_valid:
+                return {**base, "success": False, "stage": stage, "error": pdf_contents}
+
+            report_data = {
+                "patient_name": item["patient_name"],
+                "age": item["age"],
+                "gender": item["gender"],
+                "report": pdf_contents,
+            }
+
+            stage = "analyze"
+            async with self.analyze_slots:
+                await self.rate_limiter.acquire()
+                result = await self.analysis_agent.aanalyze_report(
+                    data=report_data,
+                    system_prompt=SPECIALIST_PROMPTS["comprehensive_analyst"],
+                    use_cache=True,
+                    task="analysis"
+                )
+            if not result["success"]:
+                return {**base, "success": False, "stage": stage, "error": result["error"]}
+
+            stage = "persist"
+            async with self.persist_slots:
+                await self._persist(item, result["content"])
+                await self.report_store.put(item["session_id"], report_data)
+
+            return {**base, "success": True, "analysis": result, "session_id": item["session_id"]}
+
+        except Exception as e:
+            logger.error(f"Batch item {item['index']} failed during {stage}: {e}")
+            return {**base, "success": False, "stage": stage, "error": str(e)}
+
+    async def _persist(self, item, content):
+        session_id = item["session_id"]
+        user_message = (
+            f"Analyzing report for patient: {item['patient_name']}, Age: {item['age']}, Gender: {item['gender']}."
+        )
+        for message, role in ((user_message, "user"), (content, "assistant")):
+            self.message_writer.enqueue(session_id, message, role)
@@ -0,0 +1,138 @@
+import threading
+import time
+
+
+class CircuitState:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class ModelHealth:
+    """
+    Live health of one model: EWMA latency and error rate, rate-limit backoff and
+    a circuit breaker.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and the model
+    is skipped for ``open_seconds`` (doubling on every re-open, up to ``max_open_seconds``).
+    Then a single half-open probe request is let through: success closes the circuit,
+    failure re-opens it. Rate-limit responses put the model into an exponential
+    backoff window instead of sleeping the caller.
+    """
+
+    def __init__(self, model, alpha=0.3, failure_threshold=3, open_seconds=15.0, max_open_seconds=300.0,
+                 backoff_seconds=2.0, max_backoff_seconds=60.0, degraded_error_rate=0.5):
+        self.model = model
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.degraded_error_rate = degraded_error_rate
+
+        self.state = CircuitState.CLOSED
+        self.latency_ewma = None
+        self.error_rate_ewma = 0.0
+        self.consecutive_failures = 0
+        self.consecutive_rate_limits = 0
+        self.reopen_count = 0
+        self.opened_until = 0.0
+        self.backoff_until = 0.0
+        self.probe_in_flight = False
+        self.requests = 0
+        self.failures = 0
+        self.rate_limits = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, now=None):
+        """Return True if a request may be sent to this model now (claims the probe slot when half-open)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if now < self.backoff_until:
+                return False
+            if self.state == CircuitState.OPEN:
+                if now < self.opened_until:
+                    return False
+                self.state = CircuitState.HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == CircuitState.HALF_OPEN:
+                if self.probe_in_flight:
+                    return False
+                self.probe_in_flight = True
+            return True
+
+    def is_available(self, now=None):
+        """Non-claiming check used for ordering."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if now < self.backoff_until:
+                return False
+            if self.state == CircuitState.OPEN:
+                return now >= self.opened_until
+            if self.state == CircuitState.HALF_OPEN:
+                return not self.probe_in_flight
+            return True
+
+    @property
+    def degraded(self):
+        return self.error_rate_ewma >= self.degraded_error_rate
+
+    def record_success(self, latency):
+        with self._lock:
+            self.requests += 1
+            self.latency_ewma = latency if self.latency_ewma is None else (
+                self.alpha * latency + (1 - self.alpha) * self.latency_ewma
+            )
+            self.error_rate_ewma *= (1 - self.alpha)
+            self.consecutive_failures = 0
+            self.consecutive_rate_limits = 0
+            self.reopen_count = 0
+            self.state = CircuitState.CLOSED
+            self.probe_in_flight = False
+
+    def record_failure(self, latency, rate_limited=False, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.requests += 1
+            self.failures += 1
+            self.error_rate_ewma = self.alpha + (1 - self.alpha) * self.error_rate_ewma
+            if latency is not None and self.latency_ewma is not None:
+                self.latency_ewma = self.alpha * latency + (1 - self.alpha) * self.latency_ewma
+
+            if rate_limited:
+                self.rate_limits += 1
+                delay = min(self.backoff_seconds * 2 ** self.consecutive_rate_limits, self.max_backoff_seconds)
+                self.consecutive_rate_limits += 1
+                self.backoff_until = now + delay
+            else:
+                self.consecutive_failures += 1
+
+            if self.state == CircuitState.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self._open(now)
+            self.probe_in_flight = False
+
+    def release(self):
+        """Give back a claimed probe slot without recording an outcome (e.g. the request was cancelled)."""
+        with self._lock:
+            self.probe_in_flight = False
+
+    def _open(self, now):
+        duration = min(self.open_seconds * 2 ** self.reopen_count, self.max_open_seconds)
+        self.reopen_count += 1
+        self.state = CircuitState.OPEN
+        self.opened_until = now + duration
+
+    def snapshot(self, now=None):
+        now = time.monotonic() if now is None else now
+        return {
+            "model": self.model,
+            "state": self.state,
+            "latency_ewma_seconds": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+            "error_rate_ewma": round(self.error_rate_ewma, 3),
+            "requests": self.requests,
+            "failures": self.failures,
+            "rate_limits": self.rate_limits,
+            "backoff_remaining_seconds": round(max(0.0, self.backoff_until - now), 1),
+            "open_remaining_seconds": round(max(0.0, self.opened_until - now), 1) if self.state == CircuitState.OPEN else 0.0,
+        }
@@ -1,8 +1,11 @@
-import groq
-import os
+import math
 from enum import Enum
 import logging
 import time
+from .prompt_builder import estimate_tokens, MESSAGE_OVERHEAD_TOKENS
+from .model_health import ModelHealth
+from .providers import load_model_config, build_providers
+from src.utils.metrics import MODEL_REQUEST_SECONDS, MODEL_FALLBACKS, MODEL_FAILURES, MODEL_TOKENS
 
 logger = logging.getLogger(__name__)
 
@@ -24,90 +27,335 @@ class ModelManager:
             "provider": "groq",
             "model": "llama3-8b-8192",      # For speed and general chat
             "max_tokens": 8000,
+            "context_window": 8192,
             "temperature": 0.7
         },
         ModelTier.SECONDARY: {
             "provider": "groq", 
             "model": "llama3-70b-8192",     # For power and deep analysis
             "max_tokens": 8000,
+            "context_window": 8192,
             "temperature": 0.7
         },
         ModelTier.TERTIARY: {
             "provider": "groq",
             "model": "mixtral-8x7b-32768",  # For long context
             "max_tokens": 32000, 
+            "context_window": 32768,
             "temperature": 0.7
         },
         ModelTier.FALLBACK: {
             "provider": "groq",
             "model": "gemma-7b-it",         # For reliability
             "max_tokens": 8000,
+            "context_window": 8192,
             "temperature": 0.7
         }
     }
     # --- END OF FIX ---
     
+    # Default cascade order, used when no task profile applies
+    TIER_ORDER = [ModelTier.PRIMARY, ModelTier.SECONDARY, ModelTier.TERTIARY, ModelTier.FALLBACK]
+
+    # Per-task routing: tiers in order of preference (cheapest suitable first) and the
+    # smallest completion budget worth sending the request with.
+    TASK_PROFILES = {
+        "default": {"tiers": TIER_ORDER, "min_output_tokens": 1024},
+        # Fast conversational answers and short JSON: small models first
+        "chat": {
+            "tiers": [ModelTier.PRIMARY, ModelTier.FALLBACK, ModelTier.TERTIARY, ModelTier.SECONDARY],
+            "min_output_tokens": 1024,
+        },
+        # Deep initial report analysis: strongest model first, long context next
+        "analysis": {
+            "tiers": [ModelTier.SECONDARY, ModelTier.TERTIARY, ModelTier.PRIMARY, ModelTier.FALLBACK],
+            "min_output_tokens": 2048,
+        },
+    }
+
+    # Headroom on top of the character-based token estimate
+    TOKEN_ESTIMATE_MARGIN = 1.1
+
+    # Tokens of each context window kept free for the completion when packing prompts
+    RESPONSE_TOKEN_RESERVE = 2048
+
+    # Latency-aware ordering: a tier within LATENCY_BUCKET_RATIO times the fastest healthy
+    # tier's EWMA latency keeps its preference slot; each further factor of the ratio moves
+    # it one bucket back. Latencies under LATENCY_FLOOR_SECONDS count as the floor, so
+    # sub-second differences between models never reorder the cascade.
+    LATENCY_BUCKET_RATIO = 4.0
+    LATENCY_FLOOR_SECONDS = 1.0
+
     def __init__(self):
-        self.clients = {}
-        self._initialize_clients()
-
-    def _initialize_clients(self):
-        """Initialize API clients for each provider."""
-        try:
-            api_key = os.environ.get("GROQ_API_KEY")
-            if not api_key:
-                raise ValueError("GROQ_API_KEY not found in .env file")
-            self.clients["groq"] = groq.Groq(api_key=api_key)
-        except Exception as e:
-            logger.error(f"Failed to initialize Groq client: {str(e)}")
-
-    def generate_analysis(self, data, system_prompt, retry_count=0):
+        # Tiers may be pointed at other providers via MODEL_CONFIG_PATH / MODEL_CONFIG_JSON
+        provider_settings, tiers = load_model_config({tier.value: config for tier, config in self.MODEL_CONFIG.items()})
+        self.MODEL_CONFIG = {ModelTier(name): config for name, config in tiers.items()}
+        self.providers = build_providers(provider_settings)
+        # Live health per model; rate limits back a model off instead of sleeping the caller
+        self.health = {}
+        for config in self.MODEL_CONFIG.values():
+            key = self._model_key(config)
+            self.health.setdefault(key, ModelHealth(key))
+
+    async def warm(self):
+        """Pre-open a connection to every provider; a provider that can't be reached is only logged."""
+        for name, provider in self.providers.items():
+            try:
+                await provider.warm()
+            except Exception as e:
+                logger.warning(f"Warm-up of provider '{name}' failed: {e}")
+
+    async def aclose(self):
+        for provider in self.providers.values():
+            await provider.aclose()
+
+    @staticmethod
+    def _model_key(model_config):
+        return f"{model_config['provider']}/{model_config['model']}"
+
+    def tier_model(self, tier):
+        """The "provider/model" a tier is served by, as reported in ``model_used``."""
+        return self._model_key(self.MODEL_CONFIG[tier])
+
+    def preferred_tier(self, task="default"):
+        return self._profile(task)["tiers"][0]
+
+    def prompt_budget(self, tier=None, task="default"):
+        """Tokens available for the prompt (system prompt, data and history) on the given tier."""
+        model_config = self.MODEL_CONFIG[tier or self.preferred_tier(task)]
+        return model_config["context_window"] - min(model_config["max_tokens"], self.RESPONSE_TOKEN_RESERVE)
+
+    def route(self, messages, task="default"):
         """
-        Generate analysis using the best available model with automatic fallback.
+        Plan the cascade for a request: the task's tiers, in preference order, whose
+        context window leaves room for the prompt plus a useful completion.
+        Returns a list of (tier, max_tokens) with max_tokens clamped to what fits.
+        """
+        profile = self._profile(task)
+        prompt_tokens = math.ceil(
+            sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+            * self.TOKEN_ESTIMATE_MARGIN
+        )
+        plan = []
+        for tier in profile["tiers"]:
+            model_config = self.MODEL_CONFIG[tier]
+            max_tokens = min(model_config["max_tokens"], model_config["context_window"] - prompt_tokens)
+            if max_tokens >= profile["min_output_tokens"]:
+                plan.append((tier, max_tokens))
+        if not plan:
+            logger.warning(f"No model can fit a ~{prompt_tokens} token prompt for task '{task}'")
+        return plan
+
+    def healthy_plan(self, plan):
+        """
+        Drop tiers whose circuit is open or that are backing off after a rate limit, then
+        order the rest: healthy before degraded (high recent error rate), then by EWMA
+        latency in buckets relative to the fastest tier. Preference order breaks ties.
         """
-        if retry_count > len(ModelTier):
+        available = []
+        for tier, max_tokens in plan:
+            health = self.health[self._model_key(self.MODEL_CONFIG[tier])]
+            if health.is_available():
+                available.append((tier, max_tokens, health))
+
+        latencies = [health.latency_ewma for _, _, health in available
+                     if health.latency_ewma is not None and not health.degraded]
+        fastest = max(min(latencies, default=self.LATENCY_FLOOR_SECONDS), self.LATENCY_FLOOR_SECONDS)
+
+        def latency_bucket(health):
+            # Tiers with no completed request yet keep their slot
+            if health.latency_ewma is None or health.latency_ewma <= fastest:
+                return 0
+            return int(math.log(health.latency_ewma / fastest, self.LATENCY_BUCKET_RATIO))
+
+        ranked = sorted(available, key=lambda entry: (entry[2].degraded, latency_bucket(entry[2])))
+        return [(tier, max_tokens) for tier, max_tokens, _ in ranked]
+
+    def health_snapshot(self):
+        return [health.snapshot() for health in self.health.values()]
+
+    def _profile(self, task):
+        return self.TASK_PROFILES.get(task, self.TASK_PROFILES["default"])
+
+    def _no_model_fits(self, plan, attempted=True):
+        if plan and not attempted:
+            return {"success": False, "error": "All models are temporarily unavailable. Please try again shortly."}
+        if plan:
             return {"success": False, "error": "All models failed after multiple retries"}
+        return {"success": False, "error": "The report is too large for the available models. Please upload a shorter report."}
+
+    def generate_analysis(self, data, system_prompt, task="default"):
+        """
+        Generate analysis using the best available model with automatic fallback.
+        """
+        messages = self._build_messages(data, system_prompt)
+        plan = self.route(messages, task)
+        attempted = False
+        for tier, max_tokens in self.healthy_plan(plan):
+            model_config = self.MODEL_CONFIG[tier]
+            provider_name = model_config["provider"]
+            model = model_config["model"]
+            health = self.health[self._model_key(model_config)]
+            provider = self.providers.get(provider_name)
+
+            if provider is None:
+                logger.error(f"No client available for provider: {provider_name}")
+                continue
+            if not health.acquire():
+                continue
+
+            if attempted:
+                MODEL_FALLBACKS.inc(task=task)
+            attempted = True
+            started_at = time.monotonic()
+            try:
+                logger.info(f"Attempting generation with {provider_name} model: {model}")
+
+                completion = provider.complete(model, messages, model_config["temperature"], max_tokens)
+
+                self._record_success(health, time.monotonic() - started_at, completion.usage)
+                return self._format_result(completion, provider_name, model)
+
+            except Exception as e:
+                error_message = str(e).lower()
+                logger.warning(f"Model {model} failed: {error_message}")
+                self._record_failure(health, time.monotonic() - started_at, error_message)
+            except BaseException:
+                health.release()
+                raise
+
+        return self._no_model_fits(plan, attempted)
+
+    async def agenerate_analysis(self, data, system_prompt, task="default"):
+        """
+        Async counterpart of generate_analysis for use inside the FastAPI event loop.
+        Walks the same routed cascade with the async client and never blocks the loop.
+        """
+        messages = self._build_messages(data, system_prompt)
+        plan = self.route(messages, task)
+        attempted = False
+        for tier, max_tokens in self.healthy_plan(plan):
+            model_config = self.MODEL_CONFIG[tier]
+            provider_name = model_config["provider"]
+            model = model_config["model"]
+            health = self.health[self._model_key(model_config)]
+            provider = self.providers.get(provider_name)
+
+            if provider is None:
+                logger.error(f"No client available for provider: {provider_name}")
+                continue
+            if not health.acquire():
+                continue
+
+            if attempted:
+                MODEL_FALLBACKS.inc(task=task)
+            attempted = True
+            started_at = time.monotonic()
+            try:
+                logger.info(f"Attempting async generation with {provider_name} model: {model}")
+                completion = await provider.acomplete(model, messages, model_config["temperature"], max_tokens)
+                self._record_success(health, time.monotonic() - started_at, completion.usage)
+                return self._format_result(completion, provider_name, model)
+
+            except Exception as e:
+                error_message = str(e).lower()
+                logger.warning(f"Model {model} failed: {error_message}")
+                self._record_failure(health, time.monotonic() - started_at, error_message)
+            except BaseException:
+                health.release()
+                raise
+
+        return self._no_model_fits(plan, attempted)
+
+    async def astream_analysis(self, data, system_prompt, task="default"):
+        """
+        Stream a completion token by token.
+
+        Yields ``{"type": "delta", "content": ...}`` events followed by a single
+        ``{"type": "done", ...}`` or ``{"type": "error", ...}`` event. Fallback to
+        the next tier only happens before the first token has been sent; once
+        the client has received output, a failure ends the stream with an error.
+        """
+        messages = self._build_messages(data, system_prompt)
+        plan = self.route(messages, task)
+        attempted = False
+        for tier, max_tokens in self.healthy_plan(plan):
+            model_config = self.MODEL_CONFIG[tier]
+            provider_name = model_config["provider"]
+            model = model_config["model"]
+            health = self.health[self._model_key(model_config)]
+            provider = self.providers.get(provider_name)
+
+            if provider is None:
+                logger.error(f"No client available for provider: {provider_name}")
+                continue
+            if not health.acquire():
+                continue
+
+            if attempted:
+                MODEL_FALLBACKS.inc(task=task)
+            attempted = True
+            started = False
+            started_at = time.monotonic()
+            try:
+                logger.info(f"Attempting streamed generation with {provider_name} model: {model}")
+                usage = None
+                async for kind, value in provider.astream(model, messages, model_config["temperature"], max_tokens):
+                    if kind == "usage":
+                        usage = value
+                        continue
+                    started = True
+                    yield {"type": "delta", "content": value}
+
+                self._record_success(health, time.monotonic() - started_at, usage)
+
+            except Exception as e:
+                error_message = str(e).lower()
+                logger.warning(f"Streaming with model {model} failed: {error_message}")
+                self._record_failure(health, time.monotonic() - started_at, error_message)
+
+                if started:
+                    yield {"type": "error", "error": "The response stream was interrupted. Please try again."}
+                    return
+                continue
+            except BaseException:
+                health.release()
+                raise
+
+            yield {"type": "done", "model_used": f"{provider_name}/{model}"}
+            return
+
+        yield {"type": "error", "error": self._no_model_fits(plan, attempted)["error"]}
+
+    def _record_success(self, health, elapsed, usage):
+        health.record_success(elapsed)
+        MODEL_REQUEST_SECONDS.observe(elapsed, model=health.model, outcome="success")
+        if usage is not None:
+            MODEL_TOKENS.inc(usage.prompt_tokens, model=health.model, type="prompt")
+            MODEL_TOKENS.inc(usage.completion_tokens, model=health.model, type="completion")
+
+    def _record_failure(self, health, elapsed, error_message):
+        rate_limited = self._is_rate_limited(error_message)
+        health.record_failure(elapsed, rate_limited)
+        MODEL_REQUEST_SECONDS.observe(elapsed, model=health.model, outcome="failure")
+        MODEL_FAILURES.inc(model=health.model, reason="rate_limited" if rate_limited else "error")
+
+    @staticmethod
+    def _build_messages(data, system_prompt):
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": str(data)}
+        ]
+
+    @staticmethod
+    def _format_result(completion, provider, model):
+        return {
+            "success": True,
+            "content": completion.content,
+            "model_used": f"{provider}/{model}"
+        }
 
-        # Determine which model tier to use based on retry count
-        tiers = [ModelTier.PRIMARY, ModelTier.SECONDARY, ModelTier.TERTIARY, ModelTier.FALLBACK]
-        tier = tiers[retry_count]
-            
-        model_config = self.MODEL_CONFIG[tier]
-        provider = model_config["provider"]
-        model = model_config["model"]
-        
-        if provider not in self.clients:
-            logger.error(f"No client available for provider: {provider}")
-            return self.generate_analysis(data, system_prompt, retry_count + 1)
-            
-        try:
-            client = self.clients[provider]
-            logger.info(f"Attempting generation with {provider} model: {model}")
-            
-            completion = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": str(data)}
-                ],
-                temperature=model_config["temperature"],
-                max_tokens=model_config["max_tokens"]
-            )
-            
-            return {
-                "success": True,
-                "content": completion.choices[0].message.content,
-                "model_used": f"{provider}/{model}"
-            }
-                
-        except Exception as e:
-            error_message = str(e).lower()
-            logger.warning(f"Model {model} failed: {error_message}")
-            
-            if "rate limit" in error_message or "quota" in error_message:
-                time.sleep(2)
-            
-            return self.generate_analysis(data, system_prompt, retry_count + 1)
-            
-        return {"success": False, "error": "Analysis failed with all available models"}
+    @staticmethod
+    def _is_rate_limited(error_message):
+        return "rate limit" in error_message or "quota" in error_message
     
\ No newline at end of file
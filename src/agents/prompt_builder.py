@@ -0,0 +1,139 @@
+import math
+import re
+
+from src.utils.cache import LRUCache
+
+# Rough tokens-per-character ratio for English text on Llama/Mixtral tokenizers.
+CHARS_PER_TOKEN = 4
+# Per-message framing overhead (role markers, separators) in chat templates.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_MARKDOWN = re.compile(r"[*#>`_]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def estimate_tokens(text):
+    """Cheap, tokenizer-free token estimate; deliberately rounds up."""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _truncate(text, max_tokens):
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return f"{cut} …[truncated]"
+
+
+class PromptBuilder:
+    """
+    Packs chat history into a token budget and keeps a rolling summary of older turns.
+
+    The newest turns are kept verbatim until the budget is used up. Turns that fall
+    out of the window are compacted into one line each and appended to a per-session
+    summary exactly once, so the summary grows incrementally instead of being rebuilt.
+    """
+
+    def __init__(self, max_sessions, summary_max_tokens, turn_summary_chars, message_max_share):
+        self.summaries = LRUCache(max_sessions)
+        self.summary_max_tokens = summary_max_tokens
+        self.turn_summary_chars = turn_summary_chars
+        self.message_max_share = message_max_share
+
+    def build(self, system_prompt, data, chat_history, budget, session_id=None):
+        """Return the system prompt with as much session history (and summary) as fits in ``budget`` tokens."""
+        history = self._without_current_question(chat_history or [], data)
+        if len(history) < 2:
+            return system_prompt
+
+        fixed = (
+            estimate_tokens(system_prompt)
+            + estimate_tokens(str(data))
+            + 2 * MESSAGE_OVERHEAD_TOKENS
+        )
+        available = budget - fixed
+        if available <= 0:
+            return system_prompt
+
+        # Reserve room for the summary first, then fill the rest with recent turns.
+        summary_budget = min(self.summary_max_tokens, available // 4)
+        window_budget = available - summary_budget
+        per_message_cap = max(1, int(window_budget * self.message_max_share))
+
+        window = []
+        used = 0
+        cutoff = len(history)
+        for index in range(len(history) - 1, -1, -1):
+            line = self._format_turn(history[index], per_message_cap)
+            cost = estimate_tokens(line) + MESSAGE_OVERHEAD_TOKENS
+            if used + cost > window_budget:
+                break
+            window.append(line)
+            used += cost
+            cutoff = index
+        window.reverse()
+
+        summary = self._update_summary(session_id, history, cutoff, summary_budget)
+
+        sections = [system_prompt]
+        if summary:
+            sections.append(f"## Conversation Summary (earlier turns)\n{summary}")
+        if window:
+            sections.append("## Current Session History\n" + "\n".join(window))
+        return "\n\n".join(sections)
+
+    def forget(self, session_id):
+        self.summaries.pop(session_id)
+
+    @staticmethod
+    def _without_current_question(history, data):
+        # Follow-ups save the user's question before loading history; it is already in the data.
+        question = data.get("question") if isinstance(data, dict) else None
+        if question and history and history[-1].get("role") == "user" and history[-1].get("content") == question:
+            return history[:-1]
+        return history
+
+    @staticmethod
+    def _format_turn(msg, max_tokens):
+        return f"{msg['role']}: {_truncate(msg['content'] or '', max_tokens)}"
+
+    def _compact_turn(self, msg):
+        lines = [line for line in (msg.get("content") or "").splitlines() if "disclaimer" not in line.lower()]
+        text = _WHITESPACE.sub(" ", _MARKDOWN.sub("", " ".join(lines))).strip()
+        if len(text) > self.turn_summary_chars:
+            text = text[:self.turn_summary_chars].rsplit(" ", 1)[0] + " …"
+        return f"- {msg['role']}: {text}"
+
+    def _update_summary(self, session_id, history, cutoff, summary_budget):
+        """Fold turns history[:cutoff] into the session's rolling summary and return it trimmed to budget."""
+        if cutoff == 0 or summary_budget <= 0:
+            return ""
+
+        state = self.summaries.get(session_id) if session_id else None
+        if state is None:
+            state = {"folded_until": "", "lines": []}
+
+        # History may be a sliding window of recent messages, so track folded turns
+        # by timestamp rather than by position.
+        for msg in history[:cutoff]:
+            created_at = msg.get("created_at") or ""
+            if state["folded_until"] and created_at <= state["folded_until"]:
+                continue
+            state["lines"].append(self._compact_turn(msg))
+            state["folded_until"] = max(state["folded_until"], created_at)
+
+        # Keep the newest summary lines that fit; the oldest detail is dropped first.
+        kept, used = [], 0
+        for line in reversed(state["lines"]):
+            cost = estimate_tokens(line) + 1
+            if used + cost > summary_budget:
+                break
+            kept.append(line)
+            used += cost
+        state["lines"] = kept[::-1]
+
+        if session_id:
+            self.summaries.set(session_id, state)
+        return "\n".join(state["lines"])
@@ -0,0 +1,265 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+
+from src.config.app_config import (
+    MODEL_CONFIG_PATH,
+    PROVIDER_MAX_CONNECTIONS,
+    PROVIDER_MAX_KEEPALIVE,
+    PROVIDER_KEEPALIVE_EXPIRY,
+    PROVIDER_MAX_CONCURRENCY,
+    PROVIDER_TIMEOUT_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderError(Exception):
+    """A provider call failed. Rate-limit failures say "rate limit" so the cascade can back off."""
+
+
+class Completion:
+    __slots__ = ("content", "usage")
+
+    def __init__(self, content, usage=None):
+        self.content = content
+        self.usage = usage
+
+
+class Usage:
+    __slots__ = ("prompt_tokens", "completion_tokens")
+
+    def __init__(self, prompt_tokens=0, completion_tokens=0):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+    @classmethod
+    def from_payload(cls, payload):
+        if not payload:
+            return None
+        if isinstance(payload, dict):
+            return cls(payload.get("prompt_tokens") or 0, payload.get("completion_tokens") or 0)
+        return cls(getattr(payload, "prompt_tokens", 0) or 0, getattr(payload, "completion_tokens", 0) or 0)
+
+
+class Provider:
+    """
+    One chat-completions backend with its own pooled keep-alive HTTP clients and
+    a cap on concurrent requests, so a slow provider can't take every connection.
+
+    ``complete`` / ``acomplete`` return a Completion. ``astream`` yields
+    ("delta", text) events and, when the server reports it, one ("usage", Usage).
+    """
+
+    def __init__(self, name, max_concurrency=PROVIDER_MAX_CONCURRENCY, max_connections=PROVIDER_MAX_CONNECTIONS,
+                 max_keepalive=PROVIDER_MAX_KEEPALIVE, keepalive_expiry=PROVIDER_KEEPALIVE_EXPIRY,
+                 timeout=PROVIDER_TIMEOUT_SECONDS):
+        import httpx  # deferred: only needed once a provider is built
+
+        self.name = name
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=5.0)
+        self._sync_slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_slots = asyncio.Semaphore(max_concurrency)
+
+    def complete(self, model, messages, temperature, max_tokens):
+        with self._sync_slots:
+            return self._complete(model, messages, temperature, max_tokens)
+
+    async def acomplete(self, model, messages, temperature, max_tokens):
+        async with self._async_slots:
+            return await self._acomplete(model, messages, temperature, max_tokens)
+
+    async def astream(self, model, messages, temperature, max_tokens):
+        async with self._async_slots:
+            async for event in self._astream(model, messages, temperature, max_tokens):
+                yield event
+
+    async def warm(self):
+        """Open a pooled connection ahead of the first completion."""
+
+    async def aclose(self):
+        pass
+
+
+class GroqProvider(Provider):
+    """Groq's SDK on shared pooled httpx clients."""
+
+    def __init__(self, name, api_key, base_url=None, **options):
+        import groq  # deferred: the SDK is slow to import and unused until the first request
+
+        super().__init__(name, **options)
+        self.client = groq.Groq(
+            api_key=api_key, base_url=base_url,
+            http_client=groq.DefaultHttpxClient(limits=self.limits, timeout=self.timeout),
+        )
+        self.async_client = groq.AsyncGroq(
+            api_key=api_key, base_url=base_url,
+            http_client=groq.DefaultAsyncHttpxClient(limits=self.limits, timeout=self.timeout),
+        )
+
+    def _complete(self, model, messages, temperature, max_tokens):
+        completion = self.client.chat.completions.create(
+            model=model, messages=messages, temperature=temperature, max_tokens=max_tokens
+        )
+        return Completion(completion.choices[0].message.content, Usage.from_payload(completion.usage))
+
+    async def _acomplete(self, model, messages, temperature, max_tokens):
+        completion = await self.async_client.chat.completions.create(
+            model=model, messages=messages, temperature=temperature, max_tokens=max_tokens
+        )
+        return Completion(completion.choices[0].message.content, Usage.from_payload(completion.usage))
+
+    async def _astream(self, model, messages, temperature, max_tokens):
+        stream = await self.async_client.chat.completions.create(
+            model=model, messages=messages, temperature=temperature, max_tokens=max_tokens, stream=True
+        )
+        async for chunk in stream:
+            # Groq reports usage on the final chunk under x_groq
+            usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None)
+            if usage is not None:
+                yield "usage", Usage.from_payload(usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield "delta", chunk.choices[0].delta.content
+
+    async def warm(self):
+        await self.async_client.models.list()
+
+    async def aclose(self):
+        self.client.close()
+        await self.async_client.close()
+
+
+class OpenAICompatibleProvider(Provider):
+    """
+    Any server speaking the OpenAI chat completions API (vLLM, llama.cpp server,
+    Ollama, LM Studio, ...). ``base_url`` points at the API root, e.g. http://10.0.0.5:8000/v1.
+    """
+
+    def __init__(self, name, base_url, api_key=None, **options):
+        import httpx
+
+        super().__init__(name, **options)
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        base_url = base_url.rstrip("/") + "/"
+        self.client = httpx.Client(base_url=base_url, headers=headers, limits=self.limits, timeout=self.timeout)
+        self.async_client = httpx.AsyncClient(base_url=base_url, headers=headers, limits=self.limits, timeout=self.timeout)
+
+    @staticmethod
+    def _payload(model, messages, temperature, max_tokens, stream=False):
+        payload = {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens}
+        if stream:
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    @staticmethod
+    def _raise_for_status(response, body):
+        if response.status_code == 429:
+            raise ProviderError(f"rate limit exceeded ({response.status_code}): {body[:200]}")
+        if response.status_code >= 400:
+            raise ProviderError(f"HTTP {response.status_code}: {body[:200]}")
+
+    @staticmethod
+    def _completion(data):
+        return Completion(data["choices"][0]["message"]["content"], Usage.from_payload(data.get("usage")))
+
+    def _complete(self, model, messages, temperature, max_tokens):
+        response = self.client.post("chat/completions", json=self._payload(model, messages, temperature, max_tokens))
+        self._raise_for_status(response, response.text)
+        return self._completion(response.json())
+
+    async def _acomplete(self, model, messages, temperature, max_tokens):
+        response = await self.async_client.post("chat/completions", json=self._payload(model, messages, temperature, max_tokens))
+        self._raise_for_status(response, response.text)
+        return self._completion(response.json())
+
+    async def _astream(self, model, messages, temperature, max_tokens):
+        payload = self._payload(model, messages, temperature, max_tokens, stream=True)
+        async with self.async_client.stream("POST", "chat/completions", json=payload) as response:
+            if response.status_code >= 400:
+                self._raise_for_status(response, (await response.aread()).decode("utf-8", "replace"))
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage")
+                if usage:
+                    yield "usage", Usage.from_payload(usage)
+                choices = chunk.get("choices") or []
+                content = choices[0].get("delta", {}).get("content") if choices else None
+                if content:
+                    yield "delta", content
+
+    async def warm(self):
+        response = await self.async_client.get("models")
+        await response.aread()
+
+    async def aclose(self):
+        self.client.close()
+        await self.async_client.aclose()
+
+
+PROVIDER_TYPES = {
+    "groq": GroqProvider,
+    "openai": OpenAICompatibleProvider,
+}
+
+DEFAULT_PROVIDERS = {
+    "groq": {"type": "groq", "api_key_env": "GROQ_API_KEY"},
+}
+
+
+def load_model_config(default_tiers):
+    """
+    Provider and tier settings: the built-in Groq cascade, overridden by the JSON file
+    at MODEL_CONFIG_PATH or the inline JSON in MODEL_CONFIG_JSON. The JSON has a
+    ``providers`` map (name -> {"type", "base_url", "api_key_env", "max_concurrency", ...})
+    and a ``tiers`` map (primary/secondary/tertiary/fallback -> fields of MODEL_CONFIG).
+    Returns (providers, tiers) with tiers keyed by tier name.
+    """
+    providers = {name: dict(settings) for name, settings in DEFAULT_PROVIDERS.items()}
+    tiers = {name: dict(settings) for name, settings in default_tiers.items()}
+
+    raw = os.environ.get("MODEL_CONFIG_JSON")
+    if MODEL_CONFIG_PATH:
+        with open(MODEL_CONFIG_PATH) as f:
+            raw = f.read()
+    if raw:
+        overrides = json.loads(raw)
+        for name, settings in overrides.get("providers", {}).items():
+            providers[name] = {**providers.get(name, {}), **settings}
+        for name, settings in overrides.get("tiers", {}).items():
+            if name not in tiers:
+                raise ValueError(f"Unknown model tier '{name}' in model config; expected one of {sorted(tiers)}")
+            tiers[name] = {**tiers[name], **settings}
+
+    used = {settings["provider"] for settings in tiers.values()}
+    return {name: settings for name, settings in providers.items() if name in used}, tiers
+
+
+def build_providers(provider_settings):
+    """Instantiate providers; one that can't be configured is logged and left out."""
+    providers = {}
+    for name, settings in provider_settings.items():
+        settings = dict(settings)
+        kind = settings.pop("type", name)
+        api_key_env = settings.pop("api_key_env", None)
+        if api_key_env:
+            settings["api_key"] = os.environ.get(api_key_env)
+        try:
+            if kind == "groq" and not settings.get("api_key"):
+                raise ValueError(f"{api_key_env or 'GROQ_API_KEY'} not found in .env file")
+            providers[name] = PROVIDER_TYPES[kind](name, **settings)
+        except Exception as e:
+            logger.error(f"Failed to initialize provider '{name}' ({kind}): {e}")
+    return providers
@@ -0,0 +1,126 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from src.utils.cache import LRUCache
+from src.config.app_config import (
+    ANALYSIS_CACHE_MAX_ENTRIES,
+    ANALYSIS_CACHE_TTL_SECONDS,
+    ANALYSIS_CACHE_DISK_TTL_SECONDS,
+    ANALYSIS_CACHE_DB_PATH,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisCache:
+    """
+    Two-tier cache for model analysis results.
+
+    Entries are content-addressed by the preprocessed report data, the system
+    prompt name and the model tier. A bounded in-memory LRU with TTL sits in
+    front of a SQLite file so results survive restarts and are shared between
+    worker processes. ``aget`` / ``aset`` run the SQLite tier in a thread so a
+    locked database file never stalls the event loop.
+    """
+
+    # Expired disk rows are deleted once every PRUNE_EVERY writes, not on each one
+    PRUNE_EVERY = 100
+
+    def __init__(self, db_path=ANALYSIS_CACHE_DB_PATH, max_entries=ANALYSIS_CACHE_MAX_ENTRIES,
+                 ttl_seconds=ANALYSIS_CACHE_TTL_SECONDS, disk_ttl_seconds=ANALYSIS_CACHE_DISK_TTL_SECONDS):
+        self.memory = LRUCache(max_entries, ttl_seconds)
+        self.db_path = db_path
+        self.disk_ttl_seconds = disk_ttl_seconds
+        self._disk_lock = threading.Lock()
+        self._writes = 0
+        self._disk_enabled = self._initialize_disk()
+
+    def _initialize_disk(self):
+        if not self.db_path:
+            return False
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS analysis_cache ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_analysis_cache_created_at ON analysis_cache (created_at)"
+                )
+            return True
+        except Exception as e:
+            logger.error(f"Analysis cache disk tier disabled: {e}")
+            return False
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    @staticmethod
+    def make_key(data, prompt_name, tier):
+        payload = json.dumps(data, sort_keys=True, default=str)
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return f"{prompt_name}:{tier}:{digest}"
+
+    def get(self, key):
+        result = self.memory.get(key)
+        if result is not None:
+            return result
+        return self._read_disk(key)
+
+    async def aget(self, key):
+        result = self.memory.get(key)
+        if result is not None or not self._disk_enabled:
+            return result
+        return await asyncio.to_thread(self._read_disk, key)
+
+    def set(self, key, result):
+        self.memory.set(key, result)
+        self._write_disk(key, result)
+
+    async def aset(self, key, result):
+        self.memory.set(key, result)
+        if self._disk_enabled:
+            await asyncio.to_thread(self._write_disk, key, result)
+
+    def _read_disk(self, key):
+        if not self._disk_enabled:
+            return None
+        try:
+            with self._disk_lock, self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value, created_at FROM analysis_cache WHERE key = ?", (key,)
+                ).fetchone()
+        except Exception as e:
+            logger.warning(f"Analysis cache disk read failed: {e}")
+            return None
+
+        if row is None or time.time() - row[1] > self.disk_ttl_seconds:
+            return None
+        result = json.loads(row[0])
+        self.memory.set(key, result)
+        return result
+
+    def _write_disk(self, key, result):
+        if not self._disk_enabled:
+            return
+        now = time.time()
+        try:
+            with self._disk_lock, self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO analysis_cache (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(result), now)
+                )
+                self._writes += 1
+                if self._writes % self.PRUNE_EVERY == 0:
+                    conn.execute(
+                        "DELETE FROM analysis_cache WHERE created_at < ?", (now - self.disk_ttl_seconds,)
+                    )
+        except Exception as e:
+            logger.warning(f"Analysis cache disk write failed: {e}")
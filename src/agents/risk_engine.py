@@ -0,0 +1,161 @@
+import numpy as np
+
+from src.utils.biomarker_parser import BiomarkerTable, parse_biomarkers
+
+# Feature columns and the analyte names (lower-cased, whitespace-normalized) they are read from.
+FEATURE_ALIASES = {
+    "total_cholesterol": ("total cholesterol", "cholesterol", "cholesterol, total", "serum cholesterol"),
+    "ldl": ("ldl cholesterol", "ldl", "ldl-c", "ldl cholesterol (direct)", "ldl cholesterol (calculated)"),
+    "hdl": ("hdl cholesterol", "hdl", "hdl-c"),
+    "triglycerides": ("triglycerides", "triglyceride", "tg"),
+    "glucose": ("glucose (fasting)", "fasting glucose", "fasting blood sugar", "fbs", "glucose"),
+    "hba1c": ("hba1c", "hemoglobin a1c", "glycated hemoglobin", "glycosylated hemoglobin", "a1c"),
+    "alt": ("alt", "alt (sgpt)", "sgpt", "alanine aminotransferase"),
+    "ast": ("ast", "ast (sgot)", "sgot", "aspartate aminotransferase"),
+    "alp": ("alkaline phosphatase", "alp"),
+    "bilirubin": ("total bilirubin", "bilirubin", "bilirubin, total"),
+    "age": (),
+}
+FEATURES = list(FEATURE_ALIASES)
+_COLUMN = {name: index for index, name in enumerate(FEATURES)}
+_ALIAS_TO_FEATURE = {alias: feature for feature, aliases in FEATURE_ALIASES.items() for alias in aliases}
+
+LABELS = {
+    "total_cholesterol": ("Total Cholesterol", "mg/dL"),
+    "ldl": ("LDL", "mg/dL"),
+    "hdl": ("HDL", "mg/dL"),
+    "triglycerides": ("Triglycerides", "mg/dL"),
+    "glucose": ("fasting glucose", "mg/dL"),
+    "hba1c": ("HbA1c", "%"),
+    "alt": ("ALT", "U/L"),
+    "ast": ("AST", "U/L"),
+    "alp": ("ALP", "U/L"),
+    "bilirubin": ("bilirubin", "mg/dL"),
+    "age": ("age", "years"),
+}
+
+# Piecewise-linear risk points per feature: (feature, x breakpoints, points at breakpoints).
+# Values outside the breakpoints clamp to the end points, so "normal" values score 0.
+RULES = {
+    "cardiovascular": [
+        ("ldl", [100, 130, 160, 190], [0, 10, 20, 30]),
+        ("hdl", [35, 40, 50], [20, 10, 0]),
+        ("total_cholesterol", [200, 240, 280], [0, 10, 15]),
+        ("triglycerides", [150, 200, 500], [0, 8, 15]),
+        ("age", [30, 45, 65, 80], [0, 8, 15, 25]),
+    ],
+    "diabetes": [
+        ("glucose", [100, 126, 200], [0, 30, 55]),
+        ("hba1c", [5.7, 6.5, 8.0], [0, 30, 50]),
+        ("triglycerides", [150, 250], [0, 10]),
+        ("hdl", [35, 50], [10, 0]),
+        ("age", [40, 65], [0, 10]),
+    ],
+    "liver": [
+        ("alt", [56, 112, 280], [0, 20, 40]),
+        ("ast", [40, 80, 200], [0, 20, 35]),
+        ("alp", [147, 300], [0, 15]),
+        ("bilirubin", [1.2, 2.0, 4.0], [0, 15, 30]),
+    ],
+}
+BASE_SCORE = 5
+AST_ALT_RATIO_POINTS = 10
+
+
+def _normalize(name):
+    return " ".join(name.lower().split())
+
+
+def _format_value(value):
+    return f"{value:.10g}"
+
+
+class RiskEngine:
+    """
+    Deterministic, rule-based risk scoring over parsed biomarkers.
+
+    Reports are packed into an (n_reports x n_features) matrix with NaN for
+    missing markers, and every rule is evaluated column-wise with NumPy, so a
+    batch of reports costs about the same as one. Output matches the JSON shape
+    of the ``risk_scorer`` prompt.
+    """
+
+    def feature_matrix(self, reports):
+        matrix = np.full((len(reports), len(FEATURES)), np.nan)
+        for i, report in enumerate(reports):
+            table, age = self._table_and_age(report)
+            for row in table:
+                feature = _ALIAS_TO_FEATURE.get(_normalize(row.analyte))
+                if feature and np.isnan(matrix[i, _COLUMN[feature]]):
+                    matrix[i, _COLUMN[feature]] = row.value
+            if age is not None:
+                matrix[i, _COLUMN["age"]] = age
+        return matrix
+
+    def score_batch(self, reports):
+        """Score many reports (report_context dicts, raw text or BiomarkerTables) in one pass."""
+        matrix = self.feature_matrix(reports)
+        results = [{} for _ in reports]
+
+        for category, rules in RULES.items():
+            points = np.zeros((len(reports), len(rules)))
+            present = np.zeros((len(reports), len(rules)), dtype=bool)
+            for j, (feature, xp, fp) in enumerate(rules):
+                column = matrix[:, _COLUMN[feature]]
+                present[:, j] = ~np.isnan(column)
+                points[:, j] = np.where(present[:, j], np.interp(column, xp, fp), 0.0)
+
+            totals = BASE_SCORE + points.sum(axis=1)
+            if category == "liver":
+                alt = matrix[:, _COLUMN["alt"]]
+                ast = matrix[:, _COLUMN["ast"]]
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    ratio_flag = np.nan_to_num(ast / alt) > 2.0
+                totals += np.where(ratio_flag & (ast > 40), AST_ALT_RATIO_POINTS, 0)
+            scores = np.clip(np.rint(totals), 0, 100).astype(int)
+
+            for i in range(len(reports)):
+                results[i][category] = {
+                    "score": int(scores[i]),
+                    "justification": self._justify(category, rules, matrix[i], points[i], present[i]),
+                }
+        return results
+
+    def score(self, report):
+        return self.score_batch([report])[0]
+
+    def has_markers(self, report):
+        """True when the report contains at least one lab marker the engine can score."""
+        matrix = self.feature_matrix([report])
+        lab_columns = [_COLUMN[feature] for feature in FEATURES if feature != "age"]
+        return bool(np.any(~np.isnan(matrix[0, lab_columns])))
+
+    @staticmethod
+    def _table_and_age(report):
+        if isinstance(report, BiomarkerTable):
+            return report, None
+        if isinstance(report, str):
+            return parse_biomarkers(report), None
+        age = report.get("age")
+        try:
+            age = float(age) if age not in (None, "") else None
+        except (TypeError, ValueError):
+            age = None
+        return parse_biomarkers(report.get("report") or ""), age
+
+    @staticmethod
+    def _justify(category, rules, values, points, present):
+        lab_rules = [(j, rule) for j, rule in enumerate(rules) if rule[0] != "age" and present[j]]
+        if not lab_rules:
+            return f"No {category} markers were found in the report, so this score reflects baseline risk only."
+
+        def describe(feature):
+            label, unit = LABELS[feature]
+            return f"{label} {_format_value(values[_COLUMN[feature]])} {unit}"
+
+        drivers = sorted((j for j, _ in enumerate(rules) if points[j] > 0), key=lambda j: -points[j])
+        if drivers:
+            listed = " and ".join(describe(rules[j][0]) for j in drivers[:2])
+            return f"Risk is raised mainly by {listed}."
+        listed = ", ".join(describe(rule[0]) for j, rule in lab_rules[:3])
+        return f"Key markers ({listed}) are within target ranges."
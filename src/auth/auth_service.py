@@ -2,11 +2,46 @@ import os
 import re
 import time 
 from datetime import datetime
-from supabase import create_client, Client
 import logging
+from src.auth.message_cache import MessageCache
+from src.config.app_config import (
+    MESSAGE_CACHE_MAX_SESSIONS,
+    MESSAGE_CACHE_PER_SESSION,
+    MESSAGE_PAGE_SIZE,
+    MESSAGE_PREVIEW_CHARS,
+    PROFILE_CACHE_MAX_ENTRIES,
+    PROFILE_CACHE_TTL_SECONDS,
+    SESSION_DELETE_CHUNK_SIZE,
+    SESSION_PAGE_SIZE,
+)
+from src.utils.cache import LRUCache
+from src.utils.pagination import encode_cursor
+from src.utils.metrics import DB_SECONDS, DB_ERRORS
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+SESSION_LIST_COLUMNS = 'id, user_id, title, created_at'
+MESSAGE_PREVIEW_COLUMNS = 'id, session_id, role, preview, created_at'
+
+
+def _message_preview(message):
+    """A full message row reduced to MESSAGE_PREVIEW_COLUMNS, as the generated column would."""
+    return {
+        'id': message.get('id'),
+        'session_id': message.get('session_id'),
+        'role': message.get('role'),
+        'preview': (message.get('content') or '')[:MESSAGE_PREVIEW_CHARS],
+        'created_at': message.get('created_at'),
+    }
+
+
+def _page(rows, limit):
+    """Split a ``limit + 1`` row fetch into a page and the cursor for the next one."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return {'items': rows, 'next_cursor': encode_cursor(rows[-1])}
+    return {'items': rows, 'next_cursor': None}
+
 class AuthService:
     def __init__(self):
         try:
@@ -14,22 +49,48 @@ class AuthService:
             key = os.environ.get("SUPABASE_KEY")
             if not url or not key:
                 raise ValueError("Supabase URL and Key must be set in the .env file")
-            self.supabase: Client = create_client(url, key)
+            # Imported here so loading the API module doesn't pay for the Supabase SDK
+            from supabase import create_client
+            self.supabase = create_client(url, key)
+            self.message_cache = MessageCache(MESSAGE_CACHE_MAX_SESSIONS, MESSAGE_CACHE_PER_SESSION)
+            # public.users rows by user id, filled on sign-up and on first read
+            self.profile_cache = LRUCache(PROFILE_CACHE_MAX_ENTRIES, ttl_seconds=PROFILE_CACHE_TTL_SECONDS)
+            # Set by the API to a MessageWriteBehind; reads merge its not-yet-flushed messages
+            self.write_behind = None
             logging.info("AuthService initialized and Supabase client created successfully.")
         except Exception as e:
             logging.error(f"FATAL: Failed to initialize Supabase client: {e}")
             raise
 
+    def _execute(self, operation, query):
+        """Run a PostgREST query, timing it under ``operation`` (e.g. 'chat_messages.insert')."""
+        started_at = time.perf_counter()
+        try:
+            return query.execute()
+        except Exception:
+            DB_ERRORS.inc(operation=operation)
+            raise
+        finally:
+            DB_SECONDS.observe(time.perf_counter() - started_at, operation=operation)
+
+    def warm_up(self):
+        """Issue a trivial query so the PostgREST connection is open before the first request."""
+        try:
+            self._execute('users.select', self.supabase.table('users').select('id').limit(1))
+        except Exception as e:
+            logging.warning(f"Supabase warm-up query failed: {e}")
+
     def sign_up(self, email, password, name):
         """
         Signs up a new user and explicitly creates their profile in the public.users table.
         """
         try:
-            auth_response = self.supabase.auth.sign_up({
-                "email": email,
-                "password": password,
-                "options": {"data": {"name": name}}
-            })
+            with DB_SECONDS.time(operation='auth.sign_up'):
+                auth_response = self.supabase.auth.sign_up({
+                    "email": email,
+                    "password": password,
+                    "options": {"data": {"name": name}}
+                })
 
             if not auth_response.user:
                 return False, "Failed to create user. The user may already exist."
@@ -37,11 +98,13 @@ class AuthService:
             new_user = auth_response.user
             profile_data = {'id': new_user.id, 'email': new_user.email, 'name': name}
             
-            insert_response = self.supabase.table('users').insert(profile_data).execute()
+            insert_response = self._execute('users.insert', self.supabase.table('users').insert(profile_data))
 
             if not insert_response.data:
                 return False, "Could not create user profile."
 
+            # Cached now so the first sign-in doesn't depend on the new row being readable yet
+            self.profile_cache.set(new_user.id, insert_response.data[0])
             return True, {"id": new_user.id, "email": new_user.email, "name": name}
         except Exception as e:
             error_msg = str(e)
@@ -51,27 +114,22 @@ class AuthService:
 
     def sign_in(self, email, password):
         """
-        Signs in a user and returns their data, retrying if the user profile is not immediately available.
+        Signs in a user and returns their data. The profile comes from the profile cache or
+        one public.users read; if the row isn't readable yet, the auth user's own email and
+        sign-up metadata stand in for it rather than waiting on replication.
         """
         try:
-            res = self.supabase.auth.sign_in_with_password({"email": email, "password": password})
+            with DB_SECONDS.time(operation='auth.sign_in'):
+                res = self.supabase.auth.sign_in_with_password({"email": email, "password": password})
             if not res.user or not res.session:
                 return False, "Invalid login credentials"
 
-            # --- THIS IS THE FINAL, COMBINED FIX ---
-            # Implement a robust retry mechanism to handle any replication delay.
-            user_data = None
-            for attempt in range(4): # Try up to 4 times (total of ~3 seconds)
-                user_data = self.get_user_data(res.user.id)
-                if user_data:
-                    break
-                time.sleep(1) # Wait for 1 second before retrying
-            # --- END OF FIX ---
-
+            user_data = self.get_user_data(res.user.id)
             if not user_data:
-                return False, "User data not found. Please try again."
+                metadata = res.user.user_metadata or {}
+                user_data = {'id': res.user.id, 'email': res.user.email, 'name': metadata.get('name')}
 
-            user_data["token"] = res.session.access_token
+            user_data = {**user_data, "token": res.session.access_token}
             return True, user_data
         except Exception:
             return False, "Invalid login credentials"
@@ -80,11 +138,15 @@ class AuthService:
         """
         Retrieves user profile data gracefully, without using .single().
         """
+        cached = self.profile_cache.get(user_id)
+        if cached is not None:
+            return dict(cached)
         try:
-            response = self.supabase.table('users').select('*').eq('id', user_id).execute()
+            response = self._execute('users.select', self.supabase.table('users').select('*').eq('id', user_id))
             
             if response.data and len(response.data) > 0:
-                return response.data[0] # Return the first user found
+                self.profile_cache.set(user_id, response.data[0])
+                return dict(response.data[0]) # Return the first user found
             return None # Return None if no user is found
         except Exception as e:
             logging.error(f"Error fetching user data for {user_id}: {e}")
@@ -97,42 +159,207 @@ class AuthService:
             current_time = datetime.now()
             default_title = f"{current_time.strftime('%d-%m-%Y')} | {current_time.strftime('%H:%M:%S')}"
             session_data = {'user_id': user_id, 'title': title or default_title, 'created_at': current_time.isoformat()}
-            result = self.supabase.table('chat_sessions').insert(session_data).execute()
-            return True, result.data[0] if result.data else None
+            result = self._execute('chat_sessions.insert', self.supabase.table('chat_sessions').insert(session_data))
+            session = result.data[0] if result.data else None
+            if session:
+                self.message_cache.start_session(session['id'])
+            return True, session
         except Exception as e:
             logging.error(f"Error creating session for user {user_id}: {e}")
             return False, str(e)
 
     def get_user_sessions(self, user_id):
         try:
-            result = self.supabase.table('chat_sessions').select('*').eq('user_id', user_id).order('created_at', desc=True).execute()
+            result = self._execute('chat_sessions.select', self.supabase.table('chat_sessions').select('*').eq('user_id', user_id).order('created_at', desc=True))
             return True, result.data
         except Exception as e:
             logging.error(f"Error fetching sessions for user {user_id}: {e}")
             return False, []
 
+    @staticmethod
+    def _after(query, cursor, descending):
+        """Keyset condition: rows strictly after ``cursor`` (a decoded (created_at, id)) in the listing order."""
+        if cursor is None:
+            return query
+        created_at, row_id = cursor
+        op = 'lt' if descending else 'gt'
+        return query.or_(f'created_at.{op}."{created_at}",and(created_at.eq."{created_at}",id.{op}.{row_id})')
+
+    def get_user_sessions_page(self, user_id, limit=SESSION_PAGE_SIZE, cursor=None):
+        """One page of a user's sessions, newest first: {'items', 'next_cursor'}."""
+        try:
+            query = self.supabase.table('chat_sessions').select(SESSION_LIST_COLUMNS).eq('user_id', user_id)
+            query = self._after(query, cursor, descending=True)
+            result = self._execute('chat_sessions.select_page', query.order('created_at', desc=True).order('id', desc=True).limit(limit + 1))
+            return True, _page(result.data, limit)
+        except Exception as e:
+            logging.error(f"Error fetching sessions page for user {user_id}: {e}")
+            return False, None
+
     def save_chat_message(self, session_id, content, role='user'):
         try:
             message_data = {'session_id': session_id, 'content': content, 'role': role, 'created_at': datetime.now().isoformat()}
-            result = self.supabase.table('chat_messages').insert(message_data).execute()
-            return True, result.data[0] if result.data else None
+            result = self._execute('chat_messages.insert', self.supabase.table('chat_messages').insert(message_data))
+            saved = result.data[0] if result.data else None
+            self.message_cache.append(session_id, saved or message_data)
+            return True, saved
         except Exception as e:
             logging.error(f"Error saving chat message for session {session_id}: {e}")
             return False, str(e)
 
+    def save_chat_messages(self, messages):
+        """Bulk-insert chat messages in one round trip (used by the write-behind queue)."""
+        try:
+            self._execute('chat_messages.bulk_insert', self.supabase.table('chat_messages').insert(messages))
+            return True, None
+        except Exception as e:
+            logging.error(f"Error bulk-saving {len(messages)} chat messages: {e}")
+            return False, str(e)
+
+    def _with_pending(self, session_id, messages):
+        if self.write_behind is None:
+            return messages
+        pending = self.write_behind.pending(session_id)
+        if not pending:
+            return messages
+        stored_ids = {msg.get('id') for msg in messages}
+        return messages + [msg for msg in pending if msg['id'] not in stored_ids]
+
     def get_session_messages(self, session_id):
+        cached = self.message_cache.all(session_id)
+        if cached is not None:
+            return True, cached
         try:
-            result = self.supabase.table('chat_messages').select('*').eq('session_id', session_id).order('created_at').execute()
-            return True, result.data
+            result = self._execute('chat_messages.select', self.supabase.table('chat_messages').select('*').eq('session_id', session_id).order('created_at').order('id'))
+            messages = self._with_pending(session_id, result.data)
+            self.message_cache.load(session_id, messages, complete=True)
+            return True, messages
         except Exception as e:
             logging.error(f"Error fetching messages for session {session_id}: {e}")
             return False, []
 
+    def get_session_messages_page(self, session_id, limit=MESSAGE_PAGE_SIZE, cursor=None, full=True):
+        """
+        One page of a session's messages in chronological order: {'items', 'next_cursor'}.
+        With ``full=False`` each message carries a ``preview`` instead of its ``content``.
+        """
+        page = self._cached_messages_page(session_id, limit, cursor)
+        if page is None:
+            try:
+                query = self.supabase.table('chat_messages').select('*' if full else MESSAGE_PREVIEW_COLUMNS).eq('session_id', session_id)
+                query = self._after(query, cursor, descending=False)
+                result = self._execute('chat_messages.select_page', query.order('created_at').order('id').limit(limit + 1))
+            except Exception as e:
+                logging.error(f"Error fetching messages page for session {session_id}: {e}")
+                return False, None
+            page = _page(result.data, limit)
+            if page['next_cursor'] is None:
+                page['items'] = self._with_pending(session_id, page['items'])
+        if not full:
+            page['items'] = [_message_preview(msg) if 'content' in msg else msg for msg in page['items']]
+        return True, page
+
+    def _cached_messages_page(self, session_id, limit, cursor):
+        """Serve a page from a complete cached history, or None when the cache can't answer."""
+        cached = self.message_cache.all(session_id)
+        if cached is None:
+            return None
+        start = 0
+        if cursor is not None:
+            position = next((i for i, msg in enumerate(cached) if msg.get('id') == cursor[1]), None)
+            if position is None:
+                return None
+            start = position + 1
+        items = cached[start:start + limit]
+        has_more = start + limit < len(cached)
+        return {'items': items, 'next_cursor': encode_cursor(items[-1]) if has_more else None}
+
+    def get_session_message(self, session_id, message_id):
+        """A single message with its full content, for list views that only loaded previews."""
+        for msg in (self.message_cache.all(session_id) or []) + self._with_pending(session_id, []):
+            if msg.get('id') == message_id:
+                return True, msg
+        try:
+            result = self._execute('chat_messages.select', self.supabase.table('chat_messages').select('*').eq('session_id', session_id).eq('id', message_id))
+            return True, result.data[0] if result.data else None
+        except Exception as e:
+            logging.error(f"Error fetching message {message_id} in session {session_id}: {e}")
+            return False, None
+
+    def get_recent_messages(self, session_id, limit=MESSAGE_CACHE_PER_SESSION):
+        """The last ``limit`` messages in chronological order, served from the message cache when possible."""
+        cached = self.message_cache.recent(session_id, limit)
+        if cached is not None:
+            return True, cached
+        try:
+            result = self._execute('chat_messages.select', self.supabase.table('chat_messages').select('*').eq('session_id', session_id).order('created_at', desc=True).order('id', desc=True).limit(limit))
+            messages = list(reversed(result.data))
+            merged = self._with_pending(session_id, messages)
+            # Complete only if the database had nothing older and the merge cut nothing off
+            complete = len(messages) < limit and len(merged) <= limit
+            messages = merged[-limit:]
+            self.message_cache.load(session_id, messages, complete=complete)
+            return True, messages
+        except Exception as e:
+            logging.error(f"Error fetching recent messages for session {session_id}: {e}")
+            return False, []
+
     def delete_session(self, session_id):
         try:
-            self.supabase.table('chat_messages').delete().eq('session_id', session_id).execute()
-            self.supabase.table('chat_sessions').delete().eq('id', session_id).execute()
+            self._execute('chat_messages.delete', self.supabase.table('chat_messages').delete().eq('session_id', session_id))
+            self._execute('chat_sessions.delete', self.supabase.table('chat_sessions').delete().eq('id', session_id))
+            self._forget_sessions([session_id])
             return True, None
         except Exception as e:
             logging.error(f"Error deleting session {session_id}: {e}")
-            return False, str(e)
\ No newline at end of file
+            return False, str(e)
+
+    def delete_sessions(self, user_id, session_ids=None):
+        """
+        Delete the given sessions of ``user_id``, or all of them when ``session_ids`` is None,
+        with set-based DELETEs on chat_sessions; the cascade removes their messages and
+        report contexts, so this needs migration 004. IDs that aren't the user's are left alone.
+        Returns (True, deleted session IDs) or (False, error).
+        """
+        try:
+            if session_ids is None:
+                chunks = [None]
+            else:
+                session_ids = list(dict.fromkeys(session_ids))
+                chunks = [session_ids[i:i + SESSION_DELETE_CHUNK_SIZE]
+                          for i in range(0, len(session_ids), SESSION_DELETE_CHUNK_SIZE)]
+            deleted = []
+            for chunk in chunks:
+                query = self.supabase.table('chat_sessions').delete().eq('user_id', user_id)
+                if chunk is not None:
+                    query = query.in_('id', chunk)
+                result = self._execute('chat_sessions.bulk_delete', query)
+                deleted.extend(row['id'] for row in result.data or [])
+            self._forget_sessions(deleted)
+            return True, deleted
+        except Exception as e:
+            logging.error(f"Error deleting sessions for user {user_id}: {e}")
+            return False, str(e)
+
+    def _forget_sessions(self, session_ids):
+        for session_id in session_ids:
+            self.message_cache.invalidate(session_id)
+            if self.write_behind is not None:
+                self.write_behind.discard(session_id)
+
+    def save_report_context(self, session_id, report_context):
+        try:
+            row = {'session_id': session_id, 'context': report_context, 'updated_at': datetime.now().isoformat()}
+            self._execute('report_contexts.upsert', self.supabase.table('report_contexts').upsert(row))
+            return True, None
+        except Exception as e:
+            logging.error(f"Error saving report context for session {session_id}: {e}")
+            return False, str(e)
+
+    def get_report_context(self, session_id):
+        try:
+            result = self._execute('report_contexts.select', self.supabase.table('report_contexts').select('context').eq('session_id', session_id))
+            return True, result.data[0]['context'] if result.data else None
+        except Exception as e:
+            logging.error(f"Error fetching report context for session {session_id}: {e}")
+            return False, None
@@ -0,0 +1,70 @@
+import threading
+from collections import deque
+
+from src.utils.cache import LRUCache
+
+
+class _SessionMessages:
+    __slots__ = ("messages", "complete")
+
+    def __init__(self, messages, maxlen, complete):
+        self.messages = deque(messages, maxlen=maxlen)
+        self.complete = complete
+
+
+class MessageCache:
+    """
+    Recent chat messages per session: a fixed-size ring buffer per session, with
+    LRU eviction across sessions.
+
+    A session's buffer is marked ``complete`` when it holds that session's entire
+    history (new sessions, or short histories loaded from the database), so full
+    listings can be served from memory too. Writers must call ``append`` after a
+    successful insert and ``invalidate`` after a delete to keep it coherent.
+    """
+
+    def __init__(self, max_sessions, messages_per_session):
+        self.sessions = LRUCache(max_sessions)
+        self.messages_per_session = messages_per_session
+        self._lock = threading.Lock()
+
+    def start_session(self, session_id):
+        """Seed an empty, complete buffer for a session that was just created."""
+        self.sessions.set(session_id, _SessionMessages([], self.messages_per_session, complete=True))
+
+    def load(self, session_id, messages, complete):
+        complete = complete and len(messages) <= self.messages_per_session
+        self.sessions.set(session_id, _SessionMessages(messages, self.messages_per_session, complete))
+
+    def append(self, session_id, message):
+        entry = self.sessions.get(session_id)
+        if entry is None:
+            return
+        with self._lock:
+            if len(entry.messages) == entry.messages.maxlen:
+                entry.complete = False
+            entry.messages.append(message)
+
+    def recent(self, session_id, limit):
+        """The last ``limit`` messages, or None when the cache can't answer without the database."""
+        entry = self.sessions.get(session_id)
+        if entry is None:
+            return None
+        with self._lock:
+            if not entry.complete and len(entry.messages) < limit:
+                return None
+            return list(entry.messages)[-limit:]
+
+    def all(self, session_id):
+        """The full ordered history, or None unless the buffer is known to be complete."""
+        entry = self.sessions.get(session_id)
+        if entry is None or not entry.complete:
+            return None
+        with self._lock:
+            return list(entry.messages)
+
+    def invalidate(self, session_id):
+        self.sessions.pop(session_id)
+
+    def stats(self):
+        return self.sessions.stats()
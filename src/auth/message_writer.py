@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime
+
+from src.utils.metrics import STAGE_SECONDS, WRITE_BEHIND_RETRIES, WRITE_BEHIND_DROPPED
+
+
+class MessageWriteBehind:
+    """
+    Asynchronous write-behind queue for chat messages.
+
+    ``enqueue`` returns immediately: the message gets a client-side id and
+    timestamp, is written through to the AuthService message cache, and is
+    batched into bulk ``chat_messages`` inserts by a single background flusher.
+    A batch is flushed when it reaches ``batch_size`` or ``flush_interval``
+    seconds after its first message. With one flusher and a FIFO queue, each
+    session's messages reach the database in the order they were enqueued.
+    Messages stay visible through ``pending`` until their insert succeeds.
+    """
+
+    def __init__(self, auth_service, batch_size, flush_interval, max_retries):
+        self.auth_service = auth_service
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._queue = None
+        self._task = None
+        self._pending = {}
+        self._last_created_at = {}
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logging.info("Chat message write-behind queue started.")
+
+    async def stop(self):
+        """Flush everything still queued, then stop the background flusher."""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        logging.info("Chat message write-behind queue drained.")
+
+    def enqueue(self, session_id, content, role='user'):
+        self.start()
+        message = {
+            'id': str(uuid.uuid4()),
+            'session_id': session_id,
+            'content': content,
+            'role': role,
+            'created_at': self._next_created_at(session_id),
+        }
+        self._pending.setdefault(session_id, {})[message['id']] = message
+        self.auth_service.message_cache.append(session_id, message)
+        self._queue.put_nowait(message)
+        return True, message
+
+    def pending(self, session_id):
+        return list(self._pending.get(session_id, {}).values())
+
+    def discard(self, session_id):
+        """Drop unflushed messages for a session that is being deleted."""
+        self._pending.pop(session_id, None)
+        self._last_created_at.pop(session_id, None)
+
+    def _next_created_at(self, session_id):
+        # Strictly increasing per session, so ordering by created_at matches enqueue order
+        created_at = datetime.now().isoformat(timespec='microseconds')
+        last = self._last_created_at.get(session_id)
+        if last is not None and created_at <= last:
+            created_at = datetime.fromtimestamp(datetime.fromisoformat(last).timestamp() + 1e-6).isoformat(timespec='microseconds')
+        self._last_created_at[session_id] = created_at
+        return created_at
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            message = await self._queue.get()
+            if message is None:
+                break
+            batch = [message]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    message = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if message is None:
+                    closing = True
+                    break
+                batch.append(message)
+            await self._flush(batch)
+
+        # Drain anything enqueued after the shutdown signal
+        leftovers = []
+        while not self._queue.empty():
+            message = self._queue.get_nowait()
+            if message is not None:
+                leftovers.append(message)
+        for start in range(0, len(leftovers), self.batch_size):
+            await self._flush(leftovers[start:start + self.batch_size])
+
+    async def _flush(self, batch):
+        batch = [m for m in batch if m['id'] in self._pending.get(m['session_id'], {})]
+        if not batch:
+            return
+
+        for attempt in range(self.max_retries):
+            with STAGE_SECONDS.time(stage="message_flush"):
+                success, error = await asyncio.to_thread(self.auth_service.save_chat_messages, batch)
+            if success:
+                self._mark_written(batch)
+                return
+            WRITE_BEHIND_RETRIES.inc()
+            await asyncio.sleep(0.1 * 2 ** attempt)
+
+        # One bad session (e.g. deleted meanwhile) shouldn't sink the rest of the batch
+        by_session = {}
+        for message in batch:
+            by_session.setdefault(message['session_id'], []).append(message)
+        for session_id, messages in by_session.items():
+            success, error = await asyncio.to_thread(self.auth_service.save_chat_messages, messages)
+            if not success:
+                logging.error(f"Dropping {len(messages)} chat messages for session {session_id}: {error}")
+                WRITE_BEHIND_DROPPED.inc(len(messages))
+                self.auth_service.message_cache.invalidate(session_id)
+            self._mark_written(messages)
+
+    def _mark_written(self, messages):
+        for message in messages:
+            session_pending = self._pending.get(message['session_id'])
+            if session_pending is not None:
+                session_pending.pop(message['id'], None)
+                if not session_pending:
+                    del self._pending[message['session_id']]
+                    self._last_created_at.pop(message['session_id'], None)
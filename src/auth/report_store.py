@@ -0,0 +1,49 @@
+import asyncio
+import json
+import logging
+import zlib
+
+from src.utils.cache import LRUCache
+
+
+class ReportContextStore:
+    """
+    Server-side home for each session's report context (patient fields plus report text).
+
+    The persistent copy lives in the ``report_contexts`` table. A size-bounded LRU
+    of zlib-compressed JSON sits in front of it so follow-ups in an active session
+    don't round-trip to the database or require the client to resend the report.
+    """
+
+    def __init__(self, auth_service, max_entries, max_bytes):
+        self.auth_service = auth_service
+        self.cache = LRUCache(max_entries, max_weight=max_bytes, weigher=len)
+
+    @staticmethod
+    def _pack(report_context):
+        return zlib.compress(json.dumps(report_context).encode("utf-8"))
+
+    @staticmethod
+    def _unpack(blob):
+        return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+    async def put(self, session_id, report_context):
+        self.cache.set(session_id, self._pack(report_context))
+        success, error = await asyncio.to_thread(self.auth_service.save_report_context, session_id, report_context)
+        if not success:
+            logging.warning(f"Report context for session {session_id} is only cached in memory: {error}")
+        return success
+
+    async def get(self, session_id):
+        blob = self.cache.get(session_id)
+        if blob is not None:
+            return self._unpack(blob)
+
+        success, report_context = await asyncio.to_thread(self.auth_service.get_report_context, session_id)
+        if success and report_context:
+            self.cache.set(session_id, self._pack(report_context))
+            return report_context
+        return None
+
+    def invalidate(self, session_id):
+        self.cache.pop(session_id)
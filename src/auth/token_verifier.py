@@ -0,0 +1,112 @@
+import hashlib
+import logging
+import os
+import time
+
+import jwt
+
+from src.utils.cache import LRUCache
+from src.utils.metrics import DB_SECONDS
+from src.config.app_config import (
+    JWT_AUDIENCE,
+    JWKS_CACHE_SECONDS,
+    TOKEN_CACHE_MAX_ENTRIES,
+    TOKEN_CACHE_TTL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+ASYMMETRIC_ALGORITHMS = ["RS256", "ES256", "EdDSA"]
+
+
+class InvalidToken(Exception):
+    """The bearer token is missing, malformed, expired or not signed by this project."""
+
+
+class TokenVerifier:
+    """
+    Resolves a Supabase access token to the caller ({"id", "email", "role"}) without a
+    database round trip. HS256 tokens are checked against SUPABASE_JWT_SECRET; tokens
+    signed with the project's asymmetric keys are checked against its JWKS, fetched
+    once and cached for JWKS_CACHE_SECONDS. With neither available, the token is sent
+    to GoTrue's /user endpoint instead. Verified callers are cached by token hash for
+    up to TOKEN_CACHE_TTL_SECONDS, never past the token's own expiry.
+    """
+
+    def __init__(self, auth_service, jwt_secret=None):
+        self.auth_service = auth_service
+        self.jwt_secret = jwt_secret if jwt_secret is not None else os.environ.get("SUPABASE_JWT_SECRET")
+        self._jwks_client = None
+        self.cache = LRUCache(TOKEN_CACHE_MAX_ENTRIES, ttl_seconds=TOKEN_CACHE_TTL_SECONDS)
+
+    def verify(self, token):
+        """Returns (True, user) for a valid token, (False, reason) otherwise."""
+        if not token:
+            return False, "Missing bearer token"
+        key = hashlib.sha256(token.encode()).hexdigest()
+        cached = self.cache.get(key)
+        if cached is not None:
+            user, expires_at = cached
+            if expires_at > time.time():
+                return True, user
+            self.cache.pop(key)
+
+        try:
+            user, expires_at = self._verify(token)
+        except InvalidToken as e:
+            return False, str(e)
+        self.cache.set(key, (user, expires_at))
+        return True, user
+
+    def _verify(self, token):
+        try:
+            algorithm = jwt.get_unverified_header(token).get("alg")
+        except jwt.PyJWTError as e:
+            raise InvalidToken(f"Malformed token: {e}")
+
+        if algorithm == "HS256" and self.jwt_secret:
+            claims = self._decode(token, self.jwt_secret, ["HS256"])
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            try:
+                signing_key = self._jwks().get_signing_key_from_jwt(token).key
+            except jwt.PyJWTError as e:
+                raise InvalidToken(f"No signing key for token: {e}")
+            claims = self._decode(token, signing_key, [algorithm])
+        else:
+            return self._verify_remotely(token)
+
+        user = {"id": claims["sub"], "email": claims.get("email"), "role": claims.get("role")}
+        return user, claims["exp"]
+
+    @staticmethod
+    def _decode(token, key, algorithms):
+        try:
+            return jwt.decode(
+                token, key, algorithms=algorithms, audience=JWT_AUDIENCE,
+                options={"require": ["exp", "sub"]},
+            )
+        except jwt.PyJWTError as e:
+            raise InvalidToken(str(e))
+
+    def _jwks(self):
+        if self._jwks_client is None:
+            url = os.environ.get("SUPABASE_URL", "").rstrip("/")
+            self._jwks_client = jwt.PyJWKClient(
+                f"{url}/auth/v1/.well-known/jwks.json", cache_keys=True, lifespan=JWKS_CACHE_SECONDS,
+            )
+        return self._jwks_client
+
+    def _verify_remotely(self, token):
+        try:
+            with DB_SECONDS.time(operation='auth.get_user'):
+                response = self.auth_service.supabase.auth.get_user(token)
+        except Exception as e:
+            raise InvalidToken(str(e))
+        if not response or not response.user:
+            raise InvalidToken("Token was not accepted by Supabase")
+        try:
+            expires_at = jwt.decode(token, options={"verify_signature": False}).get("exp") or 0
+        except jwt.PyJWTError:
+            expires_at = 0
+        user = response.user
+        return {"id": user.id, "email": user.email, "role": user.role}, expires_at or time.time() + TOKEN_CACHE_TTL_SECONDS
@@ -1,3 +1,5 @@
+import os
+
 APP_NAME = "HIA"
 APP_DESCRIPTION = "Your Personal Health Insights Agent"
 APP_ICON = "🩺"
@@ -9,6 +11,101 @@ MAX_PDF_PAGES = 50
 SESSION_TIMEOUT_MINUTES = 30
 ANALYSIS_DAILY_LIMIT = 15
 
+# Upload handling: bodies are capped while they stream in; files above the spool
+# threshold are written to a temp file that the extraction workers memory-map
+MAX_UPLOAD_BYTES = MAX_UPLOAD_SIZE_MB * 1024 * 1024
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024  # multipart framing and the patient form fields
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+UPLOAD_SPOOL_THRESHOLD_BYTES = 2 * 1024 * 1024
+UPLOAD_SPOOL_DIR = os.environ.get("UPLOAD_SPOOL_DIR")  # None: the system temp directory
+
+# PDF extraction process pool
+PDF_EXTRACT_WORKERS = int(os.environ.get("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+PDF_PAGES_PER_TASK = int(os.environ.get("PDF_PAGES_PER_TASK", 5))
+# Pages of text with no medical term at all after which a document is rejected unread
+CONTENT_PROBE_PAGES = 3
+
+# Model providers: pooled keep-alive HTTP clients and concurrency caps per provider.
+# MODEL_CONFIG_PATH (or MODEL_CONFIG_JSON) can point tiers at other providers, see src/agents/providers.py
+MODEL_CONFIG_PATH = os.environ.get("MODEL_CONFIG_PATH")
+PROVIDER_MAX_CONCURRENCY = int(os.environ.get("PROVIDER_MAX_CONCURRENCY", 16))
+PROVIDER_MAX_CONNECTIONS = 32
+PROVIDER_MAX_KEEPALIVE = 16
+PROVIDER_KEEPALIVE_EXPIRY = 30.0
+PROVIDER_TIMEOUT_SECONDS = 60.0
+
+# Batch analysis pipeline
+BATCH_MAX_ITEMS = 50
+BATCH_EXTRACT_CONCURRENCY = PDF_EXTRACT_WORKERS
+BATCH_ANALYZE_CONCURRENCY = 4
+BATCH_PERSIST_CONCURRENCY = 8
+GROQ_REQUESTS_PER_MINUTE = int(os.environ.get("GROQ_REQUESTS_PER_MINUTE", 30))
+
+# Send the parsed biomarker table to the model instead of raw report text
+COMPACT_REPORT_ENABLED = os.environ.get("COMPACT_REPORT_ENABLED", "1") != "0"
+COMPACT_REPORT_MIN_ROWS = 5
+
+# In-memory cache in front of the persisted per-session report contexts
+REPORT_CONTEXT_CACHE_MAX_ENTRIES = 512
+REPORT_CONTEXT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Per-session recent-message cache in AuthService
+MESSAGE_CACHE_MAX_SESSIONS = 1000
+MESSAGE_CACHE_PER_SESSION = 50
+
+# Caller and profile caches in front of Supabase auth
+PROFILE_CACHE_MAX_ENTRIES = 10000
+PROFILE_CACHE_TTL_SECONDS = 60 * 60
+TOKEN_CACHE_MAX_ENTRIES = 10000
+TOKEN_CACHE_TTL_SECONDS = 5 * 60
+JWKS_CACHE_SECONDS = 10 * 60
+JWT_AUDIENCE = "authenticated"
+
+# Keyset-paginated session and message listings
+SESSION_PAGE_SIZE = 50
+MESSAGE_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 500
+MESSAGE_PREVIEW_CHARS = 200  # must match chat_messages.preview in migration 003
+
+# Bulk session deletion; IDs go in the DELETE's query string, so they're sent in chunks
+MAX_BULK_DELETE_SESSIONS = 1000
+SESSION_DELETE_CHUNK_SIZE = 100
+
+# Write-behind queue for chat message inserts
+WRITE_BEHIND_BATCH_SIZE = 50
+WRITE_BEHIND_FLUSH_INTERVAL = 0.25
+WRITE_BEHIND_MAX_RETRIES = 3
+
+# Token-budgeted chat history and rolling summaries
+SUMMARY_MAX_SESSIONS = 1024
+SUMMARY_MAX_TOKENS = 600
+SUMMARY_TURN_CHARS = 240
+HISTORY_MESSAGE_MAX_SHARE = 0.5
+
+# Extracted-text cache (keyed by SHA-256 of the uploaded PDF)
+PDF_TEXT_CACHE_MAX_ENTRIES = 128
+PDF_TEXT_CACHE_MAX_CHARS = 32 * 1024 * 1024
+
+# Analysis result cache
+INSTANCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "instance")
+ANALYSIS_CACHE_MAX_ENTRIES = 256
+ANALYSIS_CACHE_TTL_SECONDS = 6 * 60 * 60
+ANALYSIS_CACHE_DISK_TTL_SECONDS = 7 * 24 * 60 * 60
+ANALYSIS_CACHE_DB_PATH = os.environ.get("ANALYSIS_CACHE_DB_PATH", os.path.join(INSTANCE_DIR, "analysis_cache.db"))
+
+# Per-client token buckets, shared by all workers: endpoint -> (capacity, period in seconds).
+# /analyze/batch draws from the analyze_initial bucket, one token per report.
+RATE_LIMIT_DB_PATH = os.environ.get("RATE_LIMIT_DB_PATH", os.path.join(INSTANCE_DIR, "rate_limits.db"))
+RATE_LIMITS = {
+    "analyze_initial": (ANALYSIS_DAILY_LIMIT, 24 * 60 * 60),
+    "analyze_followup": (60, 60 * 60),
+    "risk_score": (60, 60 * 60),
+}
+
+# Startup: services are built on first use; set WARMUP_ON_STARTUP=1 to build them and
+# open database, model-provider and PDF-worker connections before serving traffic instead
+WARMUP_ON_STARTUP = os.environ.get("WARMUP_ON_STARTUP", "0") != "0"
+
 # UI Settings
 PRIMARY_COLOR = "#64B5F6"
 SECONDARY_COLOR = "#1976D2"
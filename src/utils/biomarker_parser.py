@@ -0,0 +1,182 @@
+import re
+
+# "Hemoglobin: 13.5 g/dL (Reference: 12.0-15.5)"
+_COLON_ROW = re.compile(
+    r"^(?P<analyte>[A-Za-z][A-Za-z0-9 ()/,.+\-]*?)\s*:\s*"
+    r"(?P<qualifier>[<>]=?)?\s*(?P<value>\d[\d,]*(?:\.\d+)?)\s*"
+    r"(?P<unit>[^\s(][^(]*?)?\s*"
+    r"\((?:reference|ref\.?|normal|range)[^:]*:\s*(?P<reference>[^)]*)\)"
+    r"\s*(?P<flag>[HL])?\s*$",
+    re.IGNORECASE,
+)
+
+# "Hemoglobin   13.5   g/dL   12.0 - 15.5   L"
+_TABULAR_ROW = re.compile(
+    r"^(?P<analyte>[A-Za-z][A-Za-z0-9 ()/,.+\-]*?)\s{2,}"
+    r"(?P<qualifier>[<>]=?)?\s*(?P<value>\d[\d,]*(?:\.\d+)?)\s+"
+    r"(?P<unit>\S+)\s+"
+    r"(?P<reference>[<>]=?\s*\d[\d,.]*|\d[\d,.]*\s*-\s*\d[\d,.]*)%?"
+    r"\s*(?P<flag>[HL])?\s*$",
+)
+
+_NUMBER = r"\d[\d,]*(?:\.\d+)?"
+_RANGE = re.compile(rf"^(?P<low>{_NUMBER})\s*-\s*(?P<high>{_NUMBER})")
+_BOUND = re.compile(rf"^(?P<op>[<>]=?)\s*(?P<bound>{_NUMBER})")
+
+# Report header fields ("Date: 15/03/2024", "Patient ID: 1234") and bare dates
+_HEADER_FIELD = re.compile(r"^[A-Za-z][A-Za-z0-9 .'/#()-]{0,40}:\s*\S")
+_DATE = re.compile(r"\b\d{1,4}[/.-]\d{1,2}[/.-]\d{1,4}\b")
+
+COMPACT_HEADER = "analyte|value|unit|reference|flag"
+
+
+def _to_float(text):
+    return float(text.replace(",", "").strip())
+
+
+def parse_reference(reference):
+    """Parse a reference string ("12.0-15.5", "<200", ">40") into (low, high); unknown bounds are None."""
+    reference = reference.strip()
+    match = _RANGE.match(reference)
+    if match:
+        return _to_float(match.group("low")), _to_float(match.group("high"))
+    match = _BOUND.match(reference)
+    if match:
+        bound = _to_float(match.group("bound"))
+        return (None, bound) if match.group("op").startswith("<") else (bound, None)
+    return None, None
+
+
+class BiomarkerRow:
+    """
+    A single lab result. Slotted to keep large batches of parsed reports compact.
+    ``qualifier`` keeps a "<" / ">" (or "<=" / ">=") in front of the value, e.g. a
+    result below the detection limit; ``value`` is then the limit, not the result.
+    """
+
+    __slots__ = ("analyte", "value", "unit", "reference", "low", "high", "flag", "qualifier")
+
+    def __init__(self, analyte, value, unit, reference, low, high, flag, qualifier=""):
+        self.analyte = analyte
+        self.value = value
+        self.unit = unit
+        self.reference = reference
+        self.low = low
+        self.high = high
+        self.flag = flag
+        self.qualifier = qualifier
+
+    @property
+    def out_of_range(self):
+        return bool(self.flag)
+
+    def to_compact(self):
+        return f"{self.analyte}|{self.qualifier}{self.value:.10g}|{self.unit}|{self.reference}|{self.flag}"
+
+    def __repr__(self):
+        return f"BiomarkerRow({self.to_compact()!r})"
+
+
+class BiomarkerTable:
+    """
+    Ordered collection of parsed biomarker rows, the report's header lines (date,
+    patient and sample fields) and any unparsed free-text notes.
+    """
+
+    __slots__ = ("rows", "notes", "header")
+
+    def __init__(self, rows, notes, header=()):
+        self.rows = rows
+        self.notes = notes
+        self.header = list(header)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def to_compact(self, max_notes=None):
+        """
+        The header lines, then a pipe-delimited table with one analyte per line, then
+        the notes (all of them unless ``max_notes`` caps the count).
+        """
+        lines = list(self.header)
+        lines.append(COMPACT_HEADER)
+        lines.extend(row.to_compact() for row in self.rows)
+        notes = self.notes if max_notes is None else self.notes[:max_notes]
+        if notes:
+            lines.append("notes:")
+            lines.extend(notes)
+        return "\n".join(lines)
+
+
+def _parse_line(line):
+    match = _COLON_ROW.match(line) or _TABULAR_ROW.match(line)
+    if not match:
+        return None
+
+    try:
+        value = _to_float(match.group("value"))
+    except ValueError:
+        return None
+
+    qualifier = match.group("qualifier") or ""
+    reference = match.group("reference").strip()
+    low, high = parse_reference(reference)
+    flag = (match.group("flag") or "").upper()
+    if not flag:
+        # A "<" value only says the result is at most the limit, so it can only be
+        # known to be low; likewise a ">" value can only be known to be high
+        if high is not None and not qualifier.startswith("<") and (value > high or qualifier and value >= high):
+            flag = "H"
+        elif low is not None and not qualifier.startswith(">") and (value < low or qualifier and value <= low):
+            flag = "L"
+
+    return BiomarkerRow(
+        analyte=" ".join(match.group("analyte").split()),
+        value=value,
+        unit=(match.group("unit") or "").strip(),
+        reference=reference,
+        low=low,
+        high=high,
+        flag=flag,
+        qualifier=qualifier,
+    )
+
+
+def parse_biomarkers(text):
+    """
+    Parse report text into a BiomarkerTable.
+
+    Lines that look like lab results become rows. Header fields ("Date: 15/03/2024",
+    "Patient ID: 1234") and lines carrying a date are kept as the header; other lines
+    that carry prose (e.g. "Additional Notes") or any digit (e.g. "ESR 30") are kept
+    as notes. Section headings and other short label lines are dropped.
+    """
+    rows = []
+    notes = []
+    header = []
+    seen_notes = set()
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        row = _parse_line(line)
+        if row is not None:
+            rows.append(row)
+            continue
+        if _HEADER_FIELD.match(line) or _DATE.search(line):
+            if line not in seen_notes:
+                seen_notes.add(line)
+                header.append(line)
+            continue
+        # Anything with a digit may be a result the table couldn't parse ("ESR 30"); only
+        # label-only lines are dropped
+        has_digit = any(char.isdigit() for char in line)
+        if not has_digit and (line.isupper() or line.endswith(":") or len(line.split()) < 3):
+            continue
+        if line not in seen_notes:
+            seen_notes.add(line)
+            notes.append(line)
+    return BiomarkerTable(rows, notes, header)
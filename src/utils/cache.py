@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe, bounded in-memory LRU cache with optional per-entry TTL.
+    Tracks hit/miss/eviction counts so callers can expose cache effectiveness.
+
+    When ``weigher`` and ``max_weight`` are given, entries are also evicted
+    until the summed weight of all values fits the budget.
+    """
+
+    def __init__(self, max_entries, ttl_seconds=None, max_weight=None, weigher=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_weight = max_weight
+        self.weigher = weigher
+        self.weight = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires_at)
+            if self.weigher:
+                self.weight += self.weigher(value)
+            while len(self._data) > self.max_entries or self._over_weight():
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            return self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
+
+    def _remove(self, key):
+        value, _ = self._data.pop(key)
+        if self.weigher:
+            self.weight -= self.weigher(value)
+        return value
+
+    def _over_weight(self):
+        return self.max_weight is not None and self.weight > self.max_weight and len(self._data) > 1
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "weight": self.weight,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,189 @@
+import threading
+import time
+from bisect import bisect_left
+
+# Seconds; spans DB round trips (ms) up to slow long-context completions (tens of seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = []
+_collectors = []
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    """Monotonic counter, one series per label combination."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, key, (), value
+
+
+class Gauge(_Metric):
+    """Last-set value, one series per label combination."""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, key, (), value
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; ``observe`` is a bisect and three additions under a lock."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def _samples(self):
+        with self._lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket", key, (("le", le),), cumulative
+            yield f"{self.name}_sum", key, (), total
+            yield f"{self.name}_count", key, (), count
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started_at")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started_at, **self.labels)
+        return False
+
+
+def register_collector(collector):
+    """
+    Register a callable evaluated at scrape time, for values that are already counted
+    elsewhere (e.g. LRUCache stats). It returns (name, kind, documentation, samples)
+    tuples, where samples is a list of (labels dict, value).
+    """
+    _collectors.append(collector)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, key, extra, value in metric._samples():
+            lines.append(f"{name}{_format_labels(list(zip(metric.labelnames, key)) + list(extra))} {value}")
+    for collector in _collectors:
+        for name, kind, documentation, samples in collector():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(list(labels.items()))} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# --- Application metrics ---
+HTTP_REQUEST_SECONDS = Histogram(
+    "sage_http_request_duration_seconds", "Time to produce the response headers, by route.",
+    ("method", "route", "status"),
+)
+STAGE_SECONDS = Histogram(
+    "sage_stage_duration_seconds", "Duration of report pipeline stages.", ("stage",),
+)
+MODEL_REQUEST_SECONDS = Histogram(
+    "sage_model_request_duration_seconds", "Duration of individual model completions.", ("model", "outcome"),
+)
+MODEL_FALLBACKS = Counter(
+    "sage_model_fallbacks_total", "Times the cascade moved on to another model after an attempt failed.", ("task",),
+)
+MODEL_FAILURES = Counter(
+    "sage_model_failures_total", "Failed model completions.", ("model", "reason"),
+)
+MODEL_TOKENS = Counter(
+    "sage_model_tokens_total", "Tokens reported by completion.usage.", ("model", "type"),
+)
+ANALYSES_COALESCED = Counter(
+    "sage_analyses_coalesced_total", "Analysis calls that joined an identical in-flight generation.",
+)
+DB_SECONDS = Histogram(
+    "sage_db_duration_seconds", "Duration of Supabase calls.", ("operation",),
+)
+DB_ERRORS = Counter(
+    "sage_db_errors_total", "Failed Supabase calls.", ("operation",),
+)
+WRITE_BEHIND_RETRIES = Counter(
+    "sage_write_behind_retries_total", "Retried bulk chat-message inserts.",
+)
+WRITE_BEHIND_DROPPED = Counter(
+    "sage_write_behind_dropped_total", "Chat messages dropped after all insert retries failed.",
+)
+IMPORT_SECONDS = Gauge(
+    "sage_import_seconds", "Wall time spent importing the API module in this worker.",
+)
+SERVICE_INIT_SECONDS = Gauge(
+    "sage_service_init_seconds", "Time taken to construct each lazily created service.", ("service",),
+)
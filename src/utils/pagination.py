@@ -0,0 +1,25 @@
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+
+
+def encode_cursor(row):
+    """Opaque cursor for the position just after ``row`` in a (created_at, id) ordering."""
+    raw = json.dumps([row['created_at'], row['id']], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    The (created_at, id) pair behind an encode_cursor value. Both parts are validated,
+    since they are interpolated into a PostgREST filter; raises ValueError otherwise.
+    """
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        datetime.fromisoformat(created_at)
+        uuid.UUID(row_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    return created_at, row_id
@@ -1,26 +1,241 @@
-import pdfplumber
+import asyncio
+import hashlib
+import io
+import logging
+import mmap
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
 # --- THE FIX: Changed relative imports to absolute from the project root ---
-from src.utils.validators import validate_pdf_content
-from src.config.app_config import MAX_PDF_PAGES
+from src.utils.validators import MedicalContentClassifier
+from src.utils.cache import LRUCache
+from src.utils.pdf_upload import SpooledPDF
+from src.utils.metrics import STAGE_SECONDS
+from src.config.app_config import (
+    CONTENT_PROBE_PAGES,
+    MAX_PDF_PAGES,
+    PDF_EXTRACT_WORKERS,
+    PDF_PAGES_PER_TASK,
+    PDF_TEXT_CACHE_MAX_ENTRIES,
+    PDF_TEXT_CACHE_MAX_CHARS,
+)
 # --- END OF FIX ---
 
+logger = logging.getLogger(__name__)
+
+SCANNED_PDF_ERROR = "Could not extract text from PDF. Please ensure it's not a scanned document."
+PAGE_LIMIT_ERROR = f"PDF exceeds maximum page limit of {MAX_PDF_PAGES}"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Extraction outcomes keyed by the SHA-256 of the uploaded bytes. Each entry holds
+# the extracted text and the content-validation verdict so repeat uploads skip parsing.
+_text_cache = LRUCache(
+    PDF_TEXT_CACHE_MAX_ENTRIES,
+    max_weight=PDF_TEXT_CACHE_MAX_CHARS,
+    weigher=lambda entry: len(entry["text"] or ""),
+)
+
+
+def get_text_cache_stats():
+    return _text_cache.stats()
+
+
+def get_extraction_pool():
+    """Return the shared extraction process pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Not fork: the pool is started lazily inside a server whose other threads may
+                # hold import or SQLite locks, and a forked child would inherit them held
+                start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                _pool = ProcessPoolExecutor(
+                    max_workers=PDF_EXTRACT_WORKERS, mp_context=multiprocessing.get_context(start_method)
+                )
+                logger.info(f"PDF extraction pool started with {PDF_EXTRACT_WORKERS} workers")
+    return _pool
+
+
+def _preload_worker():
+    import pdfplumber  # noqa: F401
+    return True
+
+
+async def warm_extraction_pool():
+    """Start every extraction worker and import pdfplumber in it before the first upload."""
+    loop = asyncio.get_running_loop()
+    pool = get_extraction_pool()
+    await asyncio.gather(*(loop.run_in_executor(pool, _preload_worker) for _ in range(PDF_EXTRACT_WORKERS)))
+
+
+def shutdown_extraction_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+@contextmanager
+def _open_source(source):
+    """Bytes are read from memory, a str is a spooled upload's path and is memory-mapped."""
+    if isinstance(source, (bytes, bytearray)):
+        yield io.BytesIO(source)
+    elif isinstance(source, str):
+        with open(source, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+    else:
+        yield source
+
+
+def _extract_pages(source, start, end, classifier=None):
+    """
+    Worker entry point: extract pages [start, end) of the document.
+    Returns (page_count, texts); texts is empty when the page limit is exceeded.
+    Pages without text are returned as None so the caller can flag scanned documents.
+    With a classifier (in-process callers only), each page is fed to it and extraction
+    stops at a scanned page or as soon as the classifier rejects the document.
+    """
+    import pdfplumber  # deferred: the async API path only parses in the pool workers
+
+    with _open_source(source) as stream, pdfplumber.open(stream) as pdf:
+        page_count = len(pdf.pages)
+        if page_count > MAX_PDF_PAGES:
+            return page_count, []
+        texts = []
+        for page in pdf.pages[start:min(end, page_count)]:
+            text = page.extract_text() or None
+            texts.append(text)
+            if classifier is not None and (text is None or _rejected(classifier, [text])):
+                break
+        return page_count, texts
+
+
+def _rejected(classifier, page_texts):
+    """Feed pages the classifier hasn't seen yet; True once it has rejected the document."""
+    for text in page_texts:
+        if classifier.feed(text + "\n"):
+            break
+    return classifier.decided and not classifier.verdict[0]
+
+
+def _assemble_text(page_texts, classifier):
+    """
+    Join page texts in order and apply the scanned-page and content checks, feeding the
+    classifier whichever pages it hasn't seen. Returns a cache entry: {"text", "is_valid", "error"}.
+    """
+    if any(text is None for text in page_texts):
+        return _entry(None, False, SCANNED_PDF_ERROR)
+
+    with STAGE_SECONDS.time(stage="pdf_validate"):
+        _rejected(classifier, page_texts[classifier.pages:])
+        is_valid, error = classifier.result()
+    if not is_valid:
+        return _entry(None, False, error)
+    return _entry("".join(extracted + "\n" for extracted in page_texts), True, None)
+
+
+def _entry(text, is_valid, error):
+    return {"text": text, "is_valid": is_valid, "error": error}
+
+
+def _entry_result(entry):
+    return entry["text"] if entry["is_valid"] else entry["error"]
+
+
+def _read_bytes(pdf_file):
+    if isinstance(pdf_file, (bytes, bytearray)):
+        return bytes(pdf_file)
+    return pdf_file.read()
+
+
 def extract_text_from_pdf(pdf_file):
-    """Extract and validate text from a PDF file stream."""
+    """Extract and validate text from a PDF file stream (or bytes), reusing cached results."""
     try:
-        text = ""
-        with pdfplumber.open(pdf_file) as pdf:
-            if len(pdf.pages) > MAX_PDF_PAGES:
-                return f"PDF exceeds maximum page limit of {MAX_PDF_PAGES}"
-            for page in pdf.pages:
-                extracted = page.extract_text()
-                if not extracted:
-                    return "Could not extract text from PDF. Please ensure it's not a scanned document."
-                text += extracted + "\n"
-        
-        is_valid, error = validate_pdf_content(text)
-        if not is_valid:
-            return error
-            
-        return text
+        pdf_bytes = _read_bytes(pdf_file)
+        digest = hashlib.sha256(pdf_bytes).hexdigest()
+        entry = _text_cache.get(digest)
+        if entry is None:
+            classifier = MedicalContentClassifier(CONTENT_PROBE_PAGES)
+            page_count, page_texts = _extract_pages(pdf_bytes, 0, MAX_PDF_PAGES, classifier)
+            if page_count > MAX_PDF_PAGES:
+                entry = _entry(None, False, PAGE_LIMIT_ERROR)
+            else:
+                entry = _assemble_text(page_texts, classifier)
+            _text_cache.set(digest, entry)
+        return _entry_result(entry)
     except Exception as e:
-        return f"Error extracting text from PDF: {str(e)}"
\ No newline at end of file
+        return f"Error extracting text from PDF: {str(e)}"
+
+
+async def extract_text_from_pdf_async(pdf_bytes):
+    """
+    Extract and validate text from PDF bytes without blocking the event loop.
+
+    Results are cached by the SHA-256 of the bytes, so a repeat upload skips
+    parsing entirely. On a miss, the first PDF_PAGES_PER_TASK pages are
+    extracted together with the page count; any remaining pages are fanned out
+    across the process pool in contiguous ranges and reassembled in page order.
+    """
+    _, result = await extract_report_async(pdf_bytes)
+    return result
+
+
+async def extract_report_async(pdf):
+    """
+    Like extract_text_from_pdf_async, but returns (is_valid, text_or_error).
+    ``pdf`` is raw bytes or a SpooledPDF; a spooled upload whose probed page count is
+    over the limit is rejected without being parsed.
+    """
+    if not isinstance(pdf, SpooledPDF):
+        pdf = SpooledPDF.from_bytes(pdf)
+    entry = _text_cache.get(pdf.digest)
+    if entry is not None:
+        return entry["is_valid"], _entry_result(entry)
+
+    if pdf.page_count is not None and pdf.page_count > MAX_PDF_PAGES:
+        entry = _entry(None, False, PAGE_LIMIT_ERROR)
+    else:
+        try:
+            with STAGE_SECONDS.time(stage="pdf_extract"):
+                entry = await _extract_entry(pdf.source)
+        except Exception as e:
+            return False, f"Error extracting text from PDF: {str(e)}"
+
+    _text_cache.set(pdf.digest, entry)
+    return entry["is_valid"], _entry_result(entry)
+
+
+async def _extract_entry(source):
+    loop = asyncio.get_running_loop()
+    pool = get_extraction_pool()
+    page_count, page_texts = await loop.run_in_executor(
+        pool, _extract_pages, source, 0, PDF_PAGES_PER_TASK
+    )
+    if page_count > MAX_PDF_PAGES:
+        return _entry(None, False, PAGE_LIMIT_ERROR)
+    if None in page_texts:
+        return _entry(None, False, SCANNED_PDF_ERROR)
+
+    # The first pages decide most documents; a clear non-report is rejected before the rest is extracted
+    classifier = MedicalContentClassifier(CONTENT_PROBE_PAGES)
+    if _rejected(classifier, page_texts):
+        return _entry(None, False, classifier.verdict[1])
+
+    if page_count > PDF_PAGES_PER_TASK:
+        ranges = [
+            (start, start + PDF_PAGES_PER_TASK)
+            for start in range(PDF_PAGES_PER_TASK, page_count, PDF_PAGES_PER_TASK)
+        ]
+        chunks = await asyncio.gather(*[
+            loop.run_in_executor(pool, _extract_pages, source, start, end)
+            for start, end in ranges
+        ])
+        for _, texts in chunks:
+            page_texts.extend(texts)
+
+    return _assemble_text(page_texts, classifier)
@@ -0,0 +1,192 @@
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+
+from src.config.app_config import (
+    MAX_UPLOAD_BYTES,
+    MAX_UPLOAD_SIZE_MB,
+    UPLOAD_CHUNK_BYTES,
+    UPLOAD_SPOOL_DIR,
+    UPLOAD_SPOOL_THRESHOLD_BYTES,
+)
+
+PDF_MAGIC = b"%PDF-"
+# The PDF spec allows junk before the header as long as it starts in the first 1024 bytes
+MAGIC_SEARCH_BYTES = 1024
+
+UPLOAD_TOO_LARGE_ERROR = f"File exceeds the {MAX_UPLOAD_SIZE_MB}MB upload limit"
+NOT_A_PDF_ERROR = "Invalid file type. Please upload a PDF file"
+
+_PAGES_NODE = re.compile(rb"/Type\s*/Pages\b")
+_COUNT = re.compile(rb"/Count\s+(\d+)")
+_LINEARIZED_PAGES = re.compile(rb"/Linearized\b[^>]*?/N\s+(\d+)")
+
+
+class UploadRejected(Exception):
+    """An upload refused before parsing; ``status_code`` is the HTTP status to answer with."""
+
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class SpooledPDF:
+    """
+    A validated PDF upload: small files stay in memory as ``data``, larger ones live in
+    a temp file at ``path`` that the extraction workers memory-map instead of receiving
+    the bytes. ``digest`` is the SHA-256 computed while the file was read, and
+    ``page_count`` the probed page count (None when the probe couldn't tell).
+    Close it (or use it as a context manager) to delete the temp file.
+    """
+
+    __slots__ = ("data", "path", "size", "digest", "page_count")
+
+    def __init__(self, data, path, size, digest, page_count):
+        self.data = data
+        self.path = path
+        self.size = size
+        self.digest = digest
+        self.page_count = page_count
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = bytes(data)
+        return cls(data, None, len(data), hashlib.sha256(data).hexdigest(), probe_page_count(data))
+
+    @property
+    def source(self):
+        """What the extraction workers open: the bytes, or the spool file's path."""
+        return self.path if self.path is not None else self.data
+
+    def close(self):
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def probe_page_count(buffer):
+    """
+    Page count read straight from the bytes, without parsing the document: the /N of a
+    linearization dictionary, else the largest /Count of a /Type /Pages node (the root
+    of the page tree). Returns None when the page tree sits in a compressed object
+    stream; the extraction workers still enforce the limit in that case.
+    """
+    linearized = _LINEARIZED_PAGES.search(buffer, 0, MAGIC_SEARCH_BYTES)
+    if linearized:
+        return int(linearized.group(1))
+
+    page_count = None
+    for node in _PAGES_NODE.finditer(buffer):
+        start = buffer.rfind(b"<<", 0, node.start())
+        end = buffer.find(b">>", node.end())
+        if start < 0 or end < 0:
+            continue
+        count = _COUNT.search(buffer, start, end)
+        if count:
+            page_count = max(page_count or 0, int(count.group(1)))
+    return page_count
+
+
+def spool_pdf(stream, max_bytes=MAX_UPLOAD_BYTES, spool_threshold=UPLOAD_SPOOL_THRESHOLD_BYTES):
+    """
+    Read an uploaded file in chunks and return a SpooledPDF. Blocking; run it in a thread.
+
+    The upload is rejected as soon as it passes ``max_bytes`` (413) or when its first
+    chunk has no PDF header (415). The hash is updated chunk by chunk, and once the
+    file outgrows ``spool_threshold`` the chunks go to a temp file rather than memory.
+    """
+    digest = hashlib.sha256()
+    chunks = []
+    spool = None
+    size = 0
+    try:
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            if size == 0 and PDF_MAGIC not in chunk[:MAGIC_SEARCH_BYTES]:
+                raise UploadRejected(415, NOT_A_PDF_ERROR)
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadRejected(413, UPLOAD_TOO_LARGE_ERROR)
+            digest.update(chunk)
+
+            if spool is None and size > spool_threshold:
+                spool = tempfile.NamedTemporaryFile(prefix="sage-upload-", suffix=".pdf", dir=UPLOAD_SPOOL_DIR, delete=False)
+                spool.writelines(chunks)
+                chunks = None
+            if spool is not None:
+                spool.write(chunk)
+            else:
+                chunks.append(chunk)
+
+        if size == 0:
+            raise UploadRejected(400, "The uploaded file is empty")
+
+        if spool is None:
+            data = b"".join(chunks)
+            return SpooledPDF(data, None, size, digest.hexdigest(), probe_page_count(data))
+
+        spool.close()
+        with open(spool.name, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            page_count = probe_page_count(mapped)
+        return SpooledPDF(None, spool.name, size, digest.hexdigest(), page_count)
+    except BaseException:
+        if spool is not None:
+            spool.close()
+            os.unlink(spool.name)
+        raise
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI middleware capping request bodies per path. A declared Content-Length over the
+    limit is answered with 413 before anything is read. Otherwise the body is counted
+    as it streams in and the request is aborted with 413 the moment it goes over, so
+    an oversized multipart upload isn't spooled to disk in full first.
+    """
+
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request body exceeds the {limit // (1024 * 1024)}MB limit for this endpoint"
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,119 @@
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucketLimiter:
+    """
+    Per-client, per-endpoint token buckets kept in a shared SQLite file.
+
+    ``rules`` maps an endpoint name to ``(capacity, period_seconds)``: a client may
+    burst up to ``capacity`` requests and regains ``capacity`` tokens per period.
+    Every uvicorn worker opens the same WAL-mode database and refills/charges a
+    bucket inside one ``BEGIN IMMEDIATE`` transaction, so the limit holds across
+    processes instead of being multiplied by the worker count. If the database
+    cannot be used the limiter fails open and logs the error.
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, db_path, rules):
+        self.db_path = db_path
+        self.rules = rules
+        self._local = threading.local()
+        self._calls = 0
+        self._enabled = self._initialize()
+
+    def _initialize(self):
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = self._connection()
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Rate limiter disabled, could not open {self.db_path}: {e}")
+            return False
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def acquire(self, identity, endpoint, cost=1):
+        """
+        Take ``cost`` tokens from the client's bucket for ``endpoint``.
+        Returns (allowed, retry_after_seconds); retry_after is 0 when allowed.
+        """
+        capacity, period = self.rules[endpoint]
+        if cost > capacity:
+            return False, period
+        if not self._enabled:
+            return True, 0
+
+        rate = capacity / period
+        key = f"{endpoint}:{identity}"
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+                conn.execute(
+                    "INSERT INTO rate_limit_buckets (key, tokens, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                    (key, tokens, now),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except Exception as e:
+            logger.warning(f"Rate limiter check failed, allowing request: {e}")
+            return True, 0
+
+        self._maybe_prune(now)
+        if allowed:
+            return True, 0
+        return False, math.ceil((cost - tokens) / rate)
+
+    def refund(self, identity, endpoint, cost=1):
+        """Give back ``cost`` tokens taken by ``acquire`` for a request that didn't go through."""
+        if not self._enabled or cost <= 0:
+            return
+        capacity, _ = self.rules[endpoint]
+        try:
+            self._connection().execute(
+                "UPDATE rate_limit_buckets SET tokens = MIN(?, tokens + ?) WHERE key = ?",
+                (capacity, cost, f"{endpoint}:{identity}"),
+            )
+        except Exception as e:
+            logger.warning(f"Rate limiter refund failed: {e}")
+
+    def _maybe_prune(self, now):
+        # A bucket untouched for a full period is back at capacity, same as having no row
+        self._calls += 1
+        if self._calls % self.PRUNE_EVERY:
+            return
+        longest = max(period for _, period in self.rules.values())
+        try:
+            self._connection().execute("DELETE FROM rate_limit_buckets WHERE updated_at < ?", (now - longest,))
+        except Exception as e:
+            logger.warning(f"Rate limiter prune failed: {e}")
@@ -51,21 +51,110 @@ def validate_pdf_file(file):
         
     return True, None
 
+MEDICAL_TERMS = (
+    'blood', 'test', 'report', 'laboratory', 'lab', 'patient', 'specimen',
+    'reference range', 'analysis', 'results', 'medical', 'diagnostic',
+    'hemoglobin', 'wbc', 'rbc', 'platelet', 'glucose', 'creatinine'
+)
+MIN_MEDICAL_TERMS = 3
+MIN_TEXT_CHARS = 50
+TEXT_TOO_SHORT_ERROR = "Extracted text is too short. Please ensure the PDF contains valid text."
+NOT_MEDICAL_ERROR = "The uploaded file doesn't appear to be a medical report. Please upload a valid medical report."
+
+
+def _trie_pattern(terms):
+    """One regex for all terms, factored by shared prefixes (lab(?:oratory)?, r(?:bc|e(?:...)))."""
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            # A term ends here; the optional group keeps the longer match preferred
+            return f"(?:{body})?" if len(branches) == 1 else f"{body}?"
+        return body
+
+    # Zero-width lookahead, so a match is tried at every offset and terms that share
+    # letters ("reportest" holds both "report" and "test") are all found
+    return re.compile(f"(?=({build(trie)}))")
+
+
+_MEDICAL_TERM_PATTERN = _trie_pattern(MEDICAL_TERMS)
+# A match also proves every shorter term inside it ("laboratory" contains "lab")
+_IMPLIED_TERMS = {term: frozenset(other for other in MEDICAL_TERMS if other in term) for term in MEDICAL_TERMS}
+
+
+class MedicalContentClassifier:
+    """
+    Page-by-page form of validate_pdf_content. ``feed`` each page's text in order; it
+    returns True once the verdict is known, so the caller can stop extracting:
+    accepted as soon as MIN_MEDICAL_TERMS distinct terms and MIN_TEXT_CHARS of text
+    have been seen, rejected when the first ``probe_pages`` pages hold real text but
+    no medical term at all. ``result()`` gives (is_valid, error) and, called after the
+    last page, applies the same checks as validate_pdf_content to the whole text.
+    """
+
+    def __init__(self, probe_pages=None):
+        self.probe_pages = probe_pages
+        self.pages = 0
+        self.terms = set()
+        self.verdict = None
+        self._text_start = None  # offsets of the first and past-the-last non-space character
+        self._text_end = 0
+        self._length = 0
+
+    @property
+    def decided(self):
+        return self.verdict is not None
+
+    def feed(self, text):
+        if self.verdict is None:
+            self._track_length(text)
+            if len(self.terms) < MIN_MEDICAL_TERMS:
+                for match in _MEDICAL_TERM_PATTERN.finditer(text.lower()):
+                    self.terms |= _IMPLIED_TERMS[match.group(1)]
+                    if len(self.terms) >= MIN_MEDICAL_TERMS:
+                        break
+            self.pages += 1
+
+            if len(self.terms) >= MIN_MEDICAL_TERMS and self._stripped_length() >= MIN_TEXT_CHARS:
+                self.verdict = (True, None)
+            elif (self.probe_pages and self.pages >= self.probe_pages and not self.terms
+                  and self._stripped_length() >= MIN_TEXT_CHARS):
+                self.verdict = (False, NOT_MEDICAL_ERROR)
+        return self.decided
+
+    def result(self):
+        if self.verdict is not None:
+            return self.verdict
+        if self._stripped_length() < MIN_TEXT_CHARS:
+            return False, TEXT_TOO_SHORT_ERROR
+        if len(self.terms) < MIN_MEDICAL_TERMS:
+            return False, NOT_MEDICAL_ERROR
+        return True, None
+
+    def _track_length(self, text):
+        stripped = text.strip()
+        if stripped:
+            leading = len(text) - len(text.lstrip())
+            if self._text_start is None:
+                self._text_start = self._length + leading
+            self._text_end = self._length + leading + len(stripped)
+        self._length += len(text)
+
+    def _stripped_length(self):
+        return 0 if self._text_start is None else self._text_end - self._text_start
+
+
 def validate_pdf_content(text):
     """Validate if the PDF content appears to be a medical report."""
-    medical_terms = [
-        'blood', 'test', 'report', 'laboratory', 'lab', 'patient', 'specimen',
-        'reference range', 'analysis', 'results', 'medical', 'diagnostic',
-        'hemoglobin', 'wbc', 'rbc', 'platelet', 'glucose', 'creatinine'
-    ]
-    
-    if len(text.strip()) < 50:
-        return False, "Extracted text is too short. Please ensure the PDF contains valid text."
-    
-    text_lower = text.lower()
-    term_matches = sum(1 for term in medical_terms if term in text_lower)
-    
-    if term_matches < 3:
-        return False, "The uploaded file doesn't appear to be a medical report. Please upload a valid medical report."
-    
-    return True, None
\ No newline at end of file
+    classifier = MedicalContentClassifier()
+    classifier.feed(text)
+    return classifier.result()
@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from src.utils.validators import (
+    MEDICAL_TERMS,
+    MIN_MEDICAL_TERMS,
+    MIN_TEXT_CHARS,
+    NOT_MEDICAL_ERROR,
+    TEXT_TOO_SHORT_ERROR,
+    MedicalContentClassifier,
+    validate_pdf_content,
+)
+
+FILLER = "x" * 64
+
+
+def substring_verdict(text):
+    """The original check: count the terms that occur anywhere in the text."""
+    if len(text.strip()) < MIN_TEXT_CHARS:
+        return False, TEXT_TOO_SHORT_ERROR
+    text_lower = text.lower()
+    if sum(1 for term in MEDICAL_TERMS if term in text_lower) < MIN_MEDICAL_TERMS:
+        return False, NOT_MEDICAL_ERROR
+    return True, None
+
+
+@pytest.mark.parametrize("text", [
+    FILLER + " reportest glucose",
+    FILLER + " lablood test",
+    FILLER + " laboratoryreport",
+    FILLER + " wbcreatinine patient",
+    FILLER + " rbcreference range blood",
+    FILLER + " reportestanalysis",
+])
+def test_overlapping_terms_match_substring_logic(text):
+    assert validate_pdf_content(text) == substring_verdict(text)
+    assert validate_pdf_content(text) == (True, None)
+
+
+def test_random_text_matches_substring_logic():
+    rng = random.Random(0)
+    fragments = list(MEDICAL_TERMS) + ["x", " ", "e", "t", "r", "lab", "po", "\n"]
+    for _ in range(2000):
+        text = "".join(rng.choice(fragments) for _ in range(rng.randint(0, 40)))
+        assert validate_pdf_content(text) == substring_verdict(text), text
+
+
+def test_page_by_page_feed_matches_whole_text():
+    pages = [FILLER, "the reportest", " and glucose"]
+    classifier = MedicalContentClassifier()
+    for page in pages:
+        classifier.feed(page)
+    assert classifier.result() == substring_verdict("".join(pages))